@@ -0,0 +1,81 @@
+import math
+import numpy as np
+from typing import Sequence, TYPE_CHECKING
+
+from constants import *
+
+if TYPE_CHECKING:
+    from car_2 import Car2
+
+
+class AIController:
+    """
+    Drives AI cars towards targets. The steering and throttle of every car are decided together in one vectorized
+    pass over arrays of the cars' poses, and only the results are handed back to each car's steer and accelerate.
+    """
+
+    throttle: float         # magnitude of the force used to drive forwards
+    steer_gain: float       # steering angle per rad of heading error, before clamping to the car's max steering
+    brake_distance: float   # cars closer than this to their target brake
+
+    def __init__(self, throttle: float = AI_THROTTLE, steer_gain: float = AI_STEER_GAIN,
+                 brake_distance: float = AI_BRAKE_DISTANCE) -> None:
+        """
+        Initializer
+
+        :param throttle: magnitude of the force used to drive forwards
+        :param steer_gain: steering angle per rad of heading error
+        :param brake_distance: distance to the target below which cars brake
+        """
+
+        self.throttle = throttle
+        self.steer_gain = steer_gain
+        self.brake_distance = brake_distance
+
+    def decide(self, pos: np.ndarray, angle: np.ndarray, targets: np.ndarray,
+               max_steering: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Decide the steering and throttle of every car
+
+        :param pos: (n, 2) positions of the cars
+        :param angle: (n,) body angles of the cars
+        :param targets: (n, 2) where each car is driving to
+        :param max_steering: (n,) max steering angle of each car
+        :return: (n,) steering angles for Car2.steer and (n,) magnitudes for Car2.accelerate
+        """
+
+        d = targets - pos
+        # a car faces along its local +y axis, i.e. (-sin(angle), cos(angle)) in world space
+        heading = np.arctan2(-d[:, 0], d[:, 1])
+        error = (heading - angle + math.pi) % (2 * math.pi) - math.pi
+
+        steer = np.clip(error * self.steer_gain, -max_steering, max_steering)
+
+        # ease off while turning around, and brake once close enough
+        throttle = np.where(np.abs(error) > math.pi / 2, self.throttle * 0.3, self.throttle)
+        throttle = np.where(np.hypot(d[:, 0], d[:, 1]) < self.brake_distance, -self.throttle, throttle)
+
+        return steer, throttle
+
+    def drive(self, cars: Sequence['Car2'], targets: np.ndarray) -> None:
+        """
+        Steer and accelerate every car towards its target for this tick
+
+        :param cars: the cars to drive
+        :param targets: (n, 2) target of each car, or (2,) one target for all of them
+        :return: None
+        """
+
+        n = len(cars)
+        if n == 0:
+            return
+
+        poses = np.array([(car.body.position.x, car.body.position.y, car.body.angle) for car in cars])
+        max_steering = np.array([car.max_steering for car in cars])
+        targets = np.broadcast_to(np.asarray(targets, dtype=float), (n, 2))
+
+        steer, throttle = self.decide(poses[:, :2], poses[:, 2], targets, max_steering)
+
+        for car, th, mag in zip(cars, steer.tolist(), throttle.tolist()):
+            car.steer(th)
+            car.accelerate(mag)
@@ -0,0 +1,120 @@
+import pygame
+from typing import Union
+
+
+class AssetCache:
+    """
+    Decodes, scales and converts each image once and hands out the same Surface to everyone who asks for it.
+    Surfaces handed out are shared, so they must never be drawn on.
+    """
+
+    surfaces: dict[tuple, pygame.Surface]
+    keys: dict[pygame.Surface, tuple]       # the key each Surface was made from, to recreate it later
+
+    def __init__(self) -> None:
+        """
+        Initializer
+        """
+
+        self.surfaces = {}
+        self.keys = {}
+
+    def image(self, path: str, size: Union[tuple[int, int], None] = None) -> pygame.Surface:
+        """
+        Get an image file, scaled to size
+
+        :param path: path of the image file
+        :param size: (w, h) to scale the image to, or None to keep its size
+        :return: the shared Surface
+        """
+
+        key = ("image", path, None if size is None else tuple(size))
+        surface = self.surfaces.get(key)
+
+        if surface is None:
+            surface = pygame.image.load(path)
+            if size is not None:
+                surface = pygame.transform.scale(surface, size)
+            surface = surface.convert_alpha()
+            self.surfaces[key] = surface
+            self.keys[surface] = key
+
+        return surface
+
+    def solid(self, size: tuple[int, int], colour: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Get a rectangle filled with a single colour
+
+        :param size: (w, h) of the rectangle
+        :param colour: fill colour
+        :return: the shared Surface
+        """
+
+        key = ("solid", tuple(size), tuple(colour))
+        surface = self.surfaces.get(key)
+
+        if surface is None:
+            surface = pygame.Surface(size)
+            surface.fill(colour)
+            surface = surface.convert_alpha()
+            self.surfaces[key] = surface
+            self.keys[surface] = key
+
+        return surface
+
+    def circle(self, radius: float, colour: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Get a filled circle on a transparent background
+
+        :param radius: radius of the circle
+        :param colour: fill colour
+        :return: the shared Surface
+        """
+
+        key = ("circle", radius, tuple(colour))
+        surface = self.surfaces.get(key)
+
+        if surface is None:
+            surface = pygame.Surface([2 * radius, 2 * radius], pygame.SRCALPHA)
+            pygame.draw.circle(surface, colour, (radius, radius), radius)
+            surface = surface.convert_alpha()
+            self.surfaces[key] = surface
+            self.keys[surface] = key
+
+        return surface
+
+    def key_of(self, surface: pygame.Surface) -> Union[tuple, None]:
+        """
+        Describe a Surface handed out by this cache so that it can be asked for again with load, e.g. by a saved game
+
+        :param surface: the shared Surface
+        :return: a picklable key, or None if the Surface didn't come from this cache
+        """
+
+        return self.keys.get(surface)
+
+    def load(self, key: tuple) -> pygame.Surface:
+        """
+        Get the Surface described by a key from key_of
+
+        :param key: the key
+        :return: the shared Surface
+        """
+
+        kind, *args = key
+
+        return getattr(self, kind)(*args)
+
+    def clear(self) -> None:
+        """
+        Forget every cached Surface
+
+        :return: None
+        """
+
+        self.surfaces.clear()
+        self.keys.clear()
+
+
+# the cache shared by the whole game
+ASSETS = AssetCache()
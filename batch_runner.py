@@ -0,0 +1,243 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+import pymunk
+
+from constants import *
+from game import Game
+from enemy import Target, MovingTarget
+from input_source import InputState, ScriptedInput
+from scenario import WEAPONS, weapon_stats, make_car, make_headless_game, target_image
+
+
+# parameters of the trial itself, which can be swept alongside the weapon's stats
+SCENARIO_PARAMS = {
+    "enemies": 5,           # number of enemies to kill
+    "enemy_hp": 1500,       # hp of every enemy
+    "moving": 0.0,          # fraction of the enemies that are MovingTargets
+    "min_distance": 150,    # closest an enemy starts to the car
+    "max_distance": 250,    # furthest an enemy starts from the car, within reach of the laser by default
+}
+
+
+def build_trial(weapon: str, params: dict, seed: int, bullet_backend: str = BULLET_BACKEND_PYMUNK) -> Game:
+    """
+    Build a headless game where an idle car holds the trigger down and aims at the enemy closest to it until every
+    enemy is dead
+
+    :param weapon: one of WEAPONS
+    :param params: values for any of the weapon's weapon_stats and of SCENARIO_PARAMS, the defaults otherwise
+    :param seed: seed for the placement of the enemies
+    :param bullet_backend: how machine gun bullets are simulated
+    :return: the game
+    """
+
+    rng = random.Random(seed)
+    scenario = {**SCENARIO_PARAMS, **{key: value for key, value in params.items() if key in SCENARIO_PARAMS}}
+    stats = {key: value for key, value in params.items() if key not in SCENARIO_PARAMS}
+
+    game = None
+
+    def script(tick: int) -> InputState:
+        if not game.enemies:
+            return InputState()
+        target = min(game.enemies, key=lambda enemy: abs(enemy.pos - game.car.pos))
+        return InputState((), game.camera.to_screen(target.pos), (True, False, False))
+
+    game = make_headless_game(input_source=ScriptedInput(script), bullet_backend=bullet_backend)
+
+    init_pos = pymunk.Vec2d(MAP_WIDTH / 2 - 20, MAP_HEIGHT / 2 - 20)
+    game.set_car(make_car(game.space, init_pos, weapon, **stats))
+
+    image = target_image()
+
+    def random_pos() -> pymunk.Vec2d:
+        distance = rng.uniform(scenario["min_distance"], scenario["max_distance"])
+        return init_pos + pymunk.Vec2d(distance, 0).rotated(rng.uniform(0, 2 * math.pi))
+
+    n_moving = round(scenario["enemies"] * scenario["moving"])
+    for i in range(scenario["enemies"]):
+        if i < n_moving:
+            target = MovingTarget(random_pos(), random_pos(), scenario["enemy_hp"], image)
+        else:
+            target = Target(random_pos(), scenario["enemy_hp"], image)
+        game.add_target(target)
+
+    return game
+
+
+def run_trial(weapon: str, params: dict, seed: int, max_ticks: int,
+              bullet_backend: str = BULLET_BACKEND_PYMUNK) -> dict:
+    """
+    Run one trial until every enemy is dead or max_ticks have passed
+
+    :param weapon: one of WEAPONS
+    :param params: values for any of the weapon's weapon_stats and of SCENARIO_PARAMS
+    :param seed: seed for the trial
+    :param max_ticks: ticks after which the trial gives up
+    :param bullet_backend: how machine gun bullets are simulated
+    :return: machine readable results; times are in seconds of simulated time
+    """
+
+    game = build_trial(weapon, params, seed, bullet_backend)
+    enemies = list(game.enemies)
+    total_hp = sum(enemy.max_hp for enemy in enemies)
+
+    first_kill = None
+    start = time.perf_counter()
+    while game.enemies and game.tick_count < max_ticks:
+        game.tick()
+        if first_kill is None and len(game.enemies) < len(enemies):
+            first_kill = game.tick_count
+    wall_time = time.perf_counter() - start
+
+    ticks = game.tick_count
+    damage = total_hp - sum(max(enemy.hp, 0) for enemy in enemies)
+
+    return {
+        "weapon": weapon,
+        "params": params,
+        "seed": seed,
+        "ticks": ticks,
+        "killed": len(enemies) - len(game.enemies),
+        "time_to_kill": ticks * game.tick_dt if not game.enemies else None,
+        "time_to_first_kill": first_kill * game.tick_dt if first_kill is not None else None,
+        "damage": damage,
+        "dps": damage / (ticks * game.tick_dt) if ticks else 0.0,
+        "ticks_per_sec": ticks / wall_time if wall_time else None,
+    }
+
+
+def summarize(weapon: str, params: dict, trials: list[dict]) -> dict:
+    """
+    Aggregate the trials of one point of the grid
+
+    :param weapon: the weapon
+    :param params: the point of the grid
+    :param trials: results of run_trial for every seed
+    :return: machine readable results
+    """
+
+    kill_times = [trial["time_to_kill"] for trial in trials if trial["time_to_kill"] is not None]
+    rates = [trial["ticks_per_sec"] for trial in trials if trial["ticks_per_sec"] is not None]
+
+    return {
+        "weapon": weapon,
+        "params": params,
+        "trials": len(trials),
+        "kill_rate": len(kill_times) / len(trials),
+        "mean_time_to_kill": statistics.fmean(kill_times) if kill_times else None,
+        "median_time_to_kill": statistics.median(kill_times) if kill_times else None,
+        "max_time_to_kill": max(kill_times) if kill_times else None,
+        "mean_dps": statistics.fmean(trial["dps"] for trial in trials),
+        "mean_ticks_per_sec": statistics.fmean(rates) if rates else None,
+    }
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    """
+    Every combination of the values in a parameter grid
+
+    :param grid: maps each parameter to the values it takes
+    :return: one dict of parameter values per combination
+    """
+
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_batch(weapon: str, grid: dict[str, list], seeds: int, max_ticks: int, workers: int = None,
+              bullet_backend: str = BULLET_BACKEND_PYMUNK, trials: bool = False) -> Iterator[dict]:
+    """
+    Run seeds trials of every point of a parameter grid in a pool of processes. Results are yielded as they come in:
+    the summary of a point as soon as all of its trials have finished, in no particular order.
+
+    :param weapon: one of WEAPONS
+    :param grid: maps parameters of the weapon's weapon_stats or SCENARIO_PARAMS to the values they take
+    :param seeds: number of trials of every point, with seeds 0 to seeds - 1
+    :param max_ticks: ticks after which a trial gives up
+    :param workers: number of processes, one per core by default
+    :param bullet_backend: how machine gun bullets are simulated
+    :param trials: also yield the result of every trial
+    :return: iterator over the results
+    """
+
+    points = expand_grid(grid)
+
+    # fail before starting any processes
+    for point in points:
+        stats = {key: value for key, value in point.items() if key not in SCENARIO_PARAMS}
+        unknown = set(stats) - set(weapon_stats(weapon))
+        if unknown:
+            raise ValueError(f"{weapon} has no stats {sorted(unknown)}")
+
+    results = [[] for _ in points]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_trial, weapon, point, seed, max_ticks, bullet_backend): i
+                   for i, point in enumerate(points) for seed in range(seeds)}
+
+        for future in as_completed(futures):
+            i = futures[future]
+            trial = future.result()
+            results[i].append(trial)
+
+            if trials:
+                yield {"type": "trial", **trial}
+            if len(results[i]) == seeds:
+                yield {"type": "summary", **summarize(weapon, points[i], results[i])}
+
+
+def parse_param(arg: str) -> tuple[str, list]:
+    """
+    Parse a --param argument of the form name=value,value,...
+
+    :param arg: the argument
+    :return: the name and its values
+    """
+
+    name, sep, values = arg.partition("=")
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"expected name=value,value,... but got {arg}")
+
+    return name, [json.loads(value) for value in values.split(",")]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep weapon stats over many headless games in parallel")
+    parser.add_argument("--weapon", choices=WEAPONS, required=True)
+    parser.add_argument("--param", type=parse_param, action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"values to sweep; a stat of the weapon or one of {', '.join(SCENARIO_PARAMS)}")
+    parser.add_argument("--seeds", type=int, default=4, help="trials of every point of the grid")
+    parser.add_argument("--max-ticks", type=int, default=120 * TICKRATE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--bullet-backend", choices=(BULLET_BACKEND_PYMUNK, BULLET_BACKEND_NUMPY),
+                        default=BULLET_BACKEND_PYMUNK)
+    parser.add_argument("--trials", action="store_true", help="also output the result of every trial")
+    parser.add_argument("--output", help="write the JSON lines here instead of stdout")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    points = 0
+
+    try:
+        for result in run_batch(args.weapon, dict(args.param), args.seeds, args.max_ticks, args.workers,
+                                args.bullet_backend, args.trials):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result["type"] == "summary":
+                points += 1
+                print(f"{points} points done in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,391 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable
+
+import pygame
+import pymunk
+
+from constants import *
+from game import Game
+from enemy import Target, MovingTarget
+from projectiles import Bullet, Rocket
+from input_source import InputState, ScriptedInput
+from asset_cache import ASSETS
+from scenario import WEAPONS, make_car, make_headless_game, target_image
+
+
+# the phases of a tick that get timed, in the order they are reported
+PHASES = ("space_step", "entity_update", "drive_ai", "laser_collide", "rl_track", "render")
+
+
+class PhaseTimer:
+    """
+    Accumulates the wall time spent in named phases of a tick by wrapping the callables that implement them
+    """
+
+    current: dict[str, float]   # seconds spent in each phase during the current tick
+    samples: dict[str, list]    # per tick totals for each phase, in seconds
+    calls: dict[str, int]       # total number of calls for each phase
+
+    def __init__(self) -> None:
+        """
+        Initializer
+        """
+
+        self.current = {phase: 0.0 for phase in PHASES}
+        self.samples = {phase: [] for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        """
+        Wrap func so that the time spent inside it is added to phase
+
+        :param phase: name of the phase
+        :param func: callable to time
+        :return: the timed callable
+        """
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.current[phase] += time.perf_counter() - start
+            self.calls[phase] += 1
+            return result
+
+        return timed
+
+    def end_tick(self) -> None:
+        """
+        Store the totals of the current tick and start a new one
+
+        :return: None
+        """
+
+        for phase in PHASES:
+            self.samples[phase].append(self.current[phase])
+            self.current[phase] = 0.0
+
+    def summary(self) -> dict:
+        """
+        Summarize the per tick timings of every phase in milliseconds
+
+        :return: dict mapping phase to its statistics
+        """
+
+        result = {}
+        for phase in PHASES:
+            samples = sorted(self.samples[phase])
+            if not samples:
+                continue
+
+            result[phase] = {
+                "calls": self.calls[phase],
+                "mean_ms": statistics.fmean(samples) * 1000,
+                "median_ms": statistics.median(samples) * 1000,
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+
+        return result
+
+
+def build_scenario(weapon: str, n_enemies: int, n_projectiles: int, seed: int = 0,
+                   bullet_backend: str = BULLET_BACKEND_PYMUNK, render_mode: str = RENDER_FULL) -> Game:
+    """
+    Build a reproducible headless game: a car firing weapon at n_enemies Targets and MovingTargets, with
+    n_projectiles Bullets and Rockets already in flight
+
+    :param weapon: one of WEAPONS
+    :param n_enemies: number of enemies, half of which move
+    :param n_projectiles: number of projectiles in flight at the start, half of which are rockets
+    :param seed: seed for the placement of enemies and projectiles
+    :param bullet_backend: how machine gun bullets are simulated
+    :param render_mode: RENDER_FULL or RENDER_DIRTY
+    :return: the game
+    """
+
+    rng = random.Random(seed)
+
+    # the mouse visits each enemy's starting position in turn, holding the trigger down
+    aim_points = []
+
+    def script(tick: int) -> InputState:
+        keys = {pygame.K_w} if (tick // 90) % 2 == 0 else {pygame.K_d}
+        aim = aim_points[(tick // 120) % len(aim_points)] if aim_points else (0, 0)
+        return InputState(keys, aim, (True, False, False))
+
+    game = make_headless_game(input_source=ScriptedInput(script), bullet_backend=bullet_backend,
+                              render_mode=render_mode)
+    game.set_car(make_car(game.space, pymunk.Vec2d(100, 100), weapon))
+
+    image = target_image()
+
+    for i in range(n_enemies):
+        pos = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+        if i % 2 == 0:
+            target = Target(pos, 1500, image)
+        else:
+            dest = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+            target = MovingTarget(pos, dest, 1500, image)
+        game.add_target(target)
+        aim_points.append((int(pos.x), int(pos.y)))
+
+    bullet_image = ASSETS.solid((2, 80), RED)
+    rocket_image = ASSETS.image("assets/rocket1.png", (65, 65))
+
+    for i in range(n_projectiles):
+        pos = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+        a_pos = rng.uniform(0, 2 * math.pi)
+        if i % 2 == 0:
+            if game.bullets is not None:
+                game.bullets.spawn(pos, pymunk.Vec2d(0, 2500).rotated(-a_pos), 20)
+            else:
+                game.add_proj(Bullet(20, pos, 2500, a_pos, bullet_image))
+        else:
+            target = rng.choice(list(game.enemies)) if game.enemies else None
+            game.add_proj(Rocket(300, 100, 25000, pos, 750, a_pos, rocket_image, target, 0.05))
+
+    return game
+
+
+def build_arena(n_cars: int, seed: int = 0, render_mode: str = RENDER_FULL) -> Game:
+    """
+    Build a reproducible headless arena: n_cars AI cars chasing an idle player car
+
+    :param n_cars: number of AI cars
+    :param seed: seed for the placement of the cars
+    :param render_mode: RENDER_FULL or RENDER_DIRTY
+    :return: the game
+    """
+
+    rng = random.Random(seed)
+
+    game = make_headless_game(render_mode=render_mode)
+    game.set_car(make_car(game.space, pymunk.Vec2d(100, 100), "machine_gun"))
+
+    for i in range(n_cars):
+        pos = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+        ai_car = make_car(game.space, pos)
+        ai_car.body.angle = rng.uniform(0, 2 * math.pi)
+        game.add_car(ai_car, ai=True)
+
+    return game
+
+
+def time_game(game: Game, ticks: int, warmup: int, render: bool) -> dict:
+    """
+    Run a game and time every phase of every tick
+
+    :param game: the game to run
+    :param ticks: number of timed ticks
+    :param warmup: number of untimed ticks run first
+    :param render: whether to time render() every tick
+    :return: machine readable results
+    """
+
+    for _ in range(warmup):
+        game.tick()
+
+    timer = PhaseTimer()
+    game.space.step = timer.wrap("space_step", game.space.step)
+    game.update_entities = timer.wrap("entity_update", game.update_entities)
+    game.drive_ai = timer.wrap("drive_ai", game.drive_ai)
+    game.laser_collide = timer.wrap("laser_collide", game.laser_collide)
+    game.rl_track = timer.wrap("rl_track", game.rl_track)
+    timed_render = timer.wrap("render", game.render)
+
+    sim_time = 0.0
+    frame_time = 0.0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        game.tick()
+        end = time.perf_counter()
+        if render:
+            timed_render()
+        sim_time += end - start
+        frame_time += time.perf_counter() - start
+        timer.end_tick()
+
+    return {
+        "ticks": ticks,
+        "ticks_per_sec": ticks / sim_time if sim_time else None,
+        "frames_per_sec": ticks / frame_time if render and frame_time else None,
+        "enemies_left": len(game.enemies),
+        "phases": timer.summary(),
+    }
+
+
+def run_scenario(weapon: str, n_enemies: int, n_projectiles: int, ticks: int, warmup: int, seed: int,
+                 render: bool, bullet_backend: str = BULLET_BACKEND_PYMUNK, render_mode: str = RENDER_FULL) -> dict:
+    """
+    Run a scenario and time every phase of every tick
+
+    :param weapon: one of WEAPONS
+    :param n_enemies: number of enemies
+    :param n_projectiles: number of projectiles in flight at the start
+    :param ticks: number of timed ticks
+    :param warmup: number of untimed ticks run first
+    :param seed: seed for the scenario
+    :param render: whether to time render() every tick
+    :param bullet_backend: how machine gun bullets are simulated
+    :param render_mode: RENDER_FULL or RENDER_DIRTY
+    :return: machine readable results
+    """
+
+    game = build_scenario(weapon, n_enemies, n_projectiles, seed, bullet_backend, render_mode)
+
+    return {
+        "scenario": weapon,
+        "enemies": n_enemies,
+        "projectiles": n_projectiles,
+        "bullet_backend": bullet_backend,
+        "render_mode": render_mode,
+        **time_game(game, ticks, warmup, render),
+    }
+
+
+def run_arena(n_cars: int, ticks: int, warmup: int, seed: int, render: bool, render_mode: str = RENDER_FULL) -> dict:
+    """
+    Run the arena stress scenario and time every phase of every tick
+
+    :param n_cars: number of AI cars
+    :param ticks: number of timed ticks
+    :param warmup: number of untimed ticks run first
+    :param seed: seed for the scenario
+    :param render: whether to time render() every tick
+    :param render_mode: RENDER_FULL or RENDER_DIRTY
+    :return: machine readable results
+    """
+
+    return {
+        "scenario": "arena",
+        "ai_cars": n_cars,
+        "render_mode": render_mode,
+        **time_game(build_arena(n_cars, seed, render_mode), ticks, warmup, render),
+    }
+
+
+def run_car_update(n_cars: int, ticks: int, warmup: int) -> dict:
+    """
+    Time Car2.update on its own. Every car drives and steers in a space of its own, so that cars don't interact and
+    the cost measured is that of a single car.
+
+    :param n_cars: number of cars
+    :param ticks: number of timed ticks
+    :param warmup: number of untimed ticks run first
+    :return: machine readable results
+    """
+
+    # sprites need a display surface to convert_alpha against
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+    init_pos = pymunk.Vec2d(100, 100)
+    cars = []
+    for i in range(n_cars):
+        space = pymunk.Space()
+        space.damping = 0.7
+        car = make_car(space, init_pos, "machine_gun")
+        cars.append(car)
+
+    samples = []
+    for tick in range(warmup + ticks):
+        elapsed = 0.0
+        for car in cars:
+            car.accelerate(10 ** 6)
+            car.steer(car.max_steering if (tick // 90) % 2 else -car.max_steering)
+            car.space.step(1 / TICKRATE)
+
+            start = time.perf_counter()
+            car.update()
+            elapsed += time.perf_counter() - start
+
+        if tick >= warmup:
+            samples.append(elapsed / n_cars)
+
+    samples.sort()
+
+    return {
+        "cars": n_cars,
+        "ticks": ticks,
+        "mean_us_per_car": statistics.fmean(samples) * 10 ** 6,
+        "median_us_per_car": statistics.median(samples) * 10 ** 6,
+        "p95_us_per_car": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 10 ** 6,
+    }
+
+
+def git_commit() -> str:
+    """
+    The commit the benchmark was run against, if known
+
+    :return: the commit hash, or an empty string
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the tick pipeline on reproducible scenarios")
+    parser.add_argument("--weapons", nargs="+", choices=WEAPONS, default=list(WEAPONS))
+    parser.add_argument("--enemies", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--projectiles", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true", help="don't time render()")
+    parser.add_argument("--bullet-backend", choices=(BULLET_BACKEND_PYMUNK, BULLET_BACKEND_NUMPY),
+                        default=BULLET_BACKEND_PYMUNK)
+    parser.add_argument("--render-mode", choices=(RENDER_FULL, RENDER_DIRTY), default=RENDER_FULL,
+                        help="repaint the whole window every frame, or only what changed")
+    parser.add_argument("--cars", type=int, nargs="*", default=[],
+                        help="also time Car2.update with this many cars")
+    parser.add_argument("--arena", type=int, nargs="*", default=[],
+                        help="also run the arena stress scenario with this many AI cars")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for n_enemies in args.enemies:
+        for weapon in args.weapons:
+            results.append(run_scenario(weapon, n_enemies, args.projectiles, args.ticks, args.warmup, args.seed,
+                                        not args.no_render, args.bullet_backend, args.render_mode))
+            print(f"{weapon} x{n_enemies}: {results[-1]['ticks_per_sec']:.1f} ticks/s", file=sys.stderr)
+
+    for n_cars in args.arena:
+        results.append(run_arena(n_cars, args.ticks, args.warmup, args.seed, not args.no_render, args.render_mode))
+        print(f"arena x{n_cars}: {results[-1]['ticks_per_sec']:.1f} ticks/s", file=sys.stderr)
+
+    car_results = []
+    for n_cars in args.cars:
+        car_results.append(run_car_update(n_cars, args.ticks, args.warmup))
+        print(f"car update x{n_cars}: {car_results[-1]['mean_us_per_car']:.1f} us/car", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "pymunk": pymunk.version,
+        "config": vars(args),
+        "results": results,
+        "car_update": car_results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,245 @@
+import numpy as np
+import pygame
+import pymunk
+from typing import Iterable, Union
+
+from constants import *
+from entities import HealthEntity
+
+
+# what the segment queries of bullets can hit
+WALL_FILTER = pymunk.ShapeFilter(mask=CATEGORY_WALL)
+
+
+class BulletSystem:
+    """
+    Machine gun bullets stored as NumPy arrays instead of pymunk bodies. Every tick all bullets advance in one
+    vectorized step, and hits are found with swept segment vs bounding box tests against the enemies, so thousands of
+    bullets can be in flight without growing the pymunk space.
+
+    A bullet is a line of length `length` centred on its position and pointing along its velocity. Hits apply damage
+    the same way Game's bullet_coll does, and bullets are removed when they hit an enemy or a wall, leave the map or
+    expire.
+    """
+
+    capacity: int
+    count: int              # number of live bullets; they occupy the first count rows of each array
+    pos: np.ndarray         # (capacity, 2) centre of each bullet
+    vel: np.ndarray         # (capacity, 2) velocity of each bullet in px/s
+    damage: np.ndarray      # (capacity,) damage done on hit
+    life: np.ndarray        # (capacity,) seconds left before the bullet expires
+    length: float           # length of a bullet in px
+    width: int              # width a bullet is drawn with in px
+    bounds: tuple[float, float, float, float]   # (left, top, right, bottom) of the map
+
+    def __init__(self, map_size: tuple[int, int], capacity: int = 1024, length: float = 80, width: int = 2) -> None:
+        """
+        Initializer
+
+        :param map_size: (w, h) of the map; bullets leaving it are removed as if they hit a wall
+        :param capacity: number of bullets to allocate room for up front; grows as needed
+        :param length: length of a bullet in px
+        :param width: width a bullet is drawn with in px
+        """
+
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.damage = np.zeros(capacity)
+        self.life = np.zeros(capacity)
+        self.length = length
+        self.width = width
+        self.bounds = (0, 0, map_size[0], map_size[1])
+
+    def _grow(self) -> None:
+        """
+        Double the capacity of the arrays
+
+        :return: None
+        """
+
+        self.capacity *= 2
+        for name in ("pos", "vel", "damage", "life"):
+            old = getattr(self, name)
+            new = np.zeros((self.capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, pos: pymunk.Vec2d, vel: pymunk.Vec2d, damage: float, lifetime: float = BULLET_LIFETIME) -> None:
+        """
+        Add a bullet
+
+        :param pos: centre of the bullet
+        :param vel: velocity of the bullet in px/s
+        :param damage: damage done on hit
+        :param lifetime: seconds before the bullet expires
+        :return: None
+        """
+
+        if self.count == self.capacity:
+            self._grow()
+
+        i = self.count
+        self.pos[i] = pos
+        self.vel[i] = vel
+        self.damage[i] = damage
+        self.life[i] = lifetime
+        self.count += 1
+
+    def step(self, dt: float, enemies: Iterable[HealthEntity], space: Union[pymunk.Space, None] = None) -> None:
+        """
+        Advance every bullet by dt seconds and resolve hits against enemies and walls
+
+        :param dt: time step in seconds
+        :param enemies: enemies that can be hit; each needs hp and a pymunk shape
+        :param space: space whose walls stop bullets, e.g. terrain and chunk obstacles
+        :return: None
+        """
+
+        n = self.count
+        if n == 0:
+            return
+
+        pos = self.pos[:n]
+        vel = self.vel[:n]
+
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        direction = vel / np.maximum(speed, 1e-9)[:, None]
+        half = direction * (self.length / 2)
+
+        # each bullet sweeps from its tail at the start of the step to its tip at the end
+        start = pos - half
+        end = pos + vel * dt + half
+
+        pos += vel * dt
+        self.life[:n] -= dt
+
+        left, top, right, bottom = self.bounds
+        dead = ((self.life[:n] <= 0) | (pos[:, 0] < left) | (pos[:, 0] > right)
+                | (pos[:, 1] < top) | (pos[:, 1] > bottom))
+
+        # how far along its sweep each bullet hits a wall, 1 and beyond for none
+        wall_t = np.full(n, np.inf)
+        if space is not None:
+            # only the bullets whose sweep crosses the bounding box of a wall near any of them are queried exactly
+            lo = np.minimum(start, end).min(axis=0)
+            hi = np.maximum(start, end).max(axis=0)
+            walls = space.bb_query(pymunk.BB(lo[0], lo[1], hi[0], hi[1]), WALL_FILTER)
+            if walls:
+                boxes = np.array([(w.bb.left, w.bb.bottom, w.bb.right, w.bb.top) for w in walls])
+                near = np.zeros(n)
+                for i in range(0, n, BULLET_CHUNK):
+                    near[i:i + BULLET_CHUNK], _ = self._first_hits(start[i:i + BULLET_CHUNK],
+                                                                   end[i:i + BULLET_CHUNK], boxes)
+                for i in np.flatnonzero((near <= 1) & ~dead).tolist():
+                    info = space.segment_query_first(tuple(start[i]), tuple(end[i]), 0, WALL_FILTER)
+                    if info is not None:
+                        wall_t[i] = info.alpha
+
+        enemies = list(enemies)
+        if enemies:
+            boxes = np.array([(e.shape.bb.left, e.shape.bb.bottom, e.shape.bb.right, e.shape.bb.top) for e in enemies])
+
+            # test in chunks so the (bullets x enemies) intermediates stay small
+            hit_t = np.zeros(n)
+            target = np.zeros(n, dtype=np.intp)
+            for i in range(0, n, BULLET_CHUNK):
+                hit_t[i:i + BULLET_CHUNK], target[i:i + BULLET_CHUNK] = self._first_hits(start[i:i + BULLET_CHUNK],
+                                                                                        end[i:i + BULLET_CHUNK], boxes)
+            # a wall in front of an enemy shields it
+            hit = (hit_t < wall_t) & ~dead
+
+            if hit.any():
+                damage = np.bincount(target[hit], weights=self.damage[:n][hit], minlength=len(enemies))
+                for i in np.flatnonzero(damage):
+                    enemies[i].hp -= float(damage[i])
+
+                dead |= hit
+
+        dead |= wall_t <= 1
+
+        if dead.any():
+            self._compact(~dead)
+
+    @staticmethod
+    def _first_hits(start: np.ndarray, end: np.ndarray, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Slab test every segment against every axis aligned box
+
+        :param start: (n, 2) segment starts
+        :param end: (n, 2) segment ends
+        :param boxes: (m, 4) boxes as (left, bottom, right, top) in pymunk's BB convention (bottom < top)
+        :return: (n,) how far along each segment it first hits a box, inf if it doesn't, and (n,) the index of that box
+        """
+
+        d = end - start
+        # avoid dividing by zero for segments parallel to an axis
+        d = np.where(d == 0, 1e-12, d)
+        inv = 1 / d
+
+        tx1 = (boxes[None, :, 0] - start[:, None, 0]) * inv[:, None, 0]
+        tx2 = (boxes[None, :, 2] - start[:, None, 0]) * inv[:, None, 0]
+        ty1 = (boxes[None, :, 1] - start[:, None, 1]) * inv[:, None, 1]
+        ty2 = (boxes[None, :, 3] - start[:, None, 1]) * inv[:, None, 1]
+
+        t_enter = np.maximum(np.minimum(tx1, tx2), np.minimum(ty1, ty2))
+        t_exit = np.minimum(np.maximum(tx1, tx2), np.maximum(ty1, ty2))
+
+        hits = (t_enter <= t_exit) & (t_exit >= 0) & (t_enter <= 1)
+        t_enter = np.where(hits, t_enter, np.inf)
+
+        first = np.argmin(t_enter, axis=1)
+
+        return np.maximum(t_enter[np.arange(len(first)), first], 0), first
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """
+        Remove every bullet that isn't kept, packing the survivors at the front of the arrays
+
+        :param keep: (count,) mask of the bullets to keep
+        :return: None
+        """
+
+        n = int(keep.sum())
+        for arr in (self.pos, self.vel, self.damage, self.life):
+            arr[:n] = arr[:self.count][keep]
+        self.count = n
+
+    def clear(self) -> None:
+        """
+        Remove every bullet
+
+        :return: None
+        """
+
+        self.count = 0
+
+    def draw(self, screen: pygame.Surface, view: pygame.Rect) -> list[pygame.Rect]:
+        """
+        Draw every bullet in view as a line
+
+        :param screen: surface to draw on
+        :param view: area of the world shown on screen
+        :return: the areas drawn on
+        """
+
+        n = self.count
+        if n == 0:
+            return []
+
+        pos = self.pos[:n]
+        margin = self.length / 2
+        visible = ((pos[:, 0] > view.left - margin) & (pos[:, 0] < view.right + margin) &
+                   (pos[:, 1] > view.top - margin) & (pos[:, 1] < view.bottom + margin))
+        if not visible.any():
+            return []
+
+        pos = pos[visible] - view.topleft
+        vel = self.vel[:n][visible]
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        half = vel / np.maximum(speed, 1e-9)[:, None] * (self.length / 2)
+        tails = (pos - half).tolist()
+        tips = (pos + half).tolist()
+
+        return [pygame.draw.line(screen, RED, tail, tip, self.width) for tail, tip in zip(tails, tips)]
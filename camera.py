@@ -0,0 +1,70 @@
+import pygame
+import pymunk
+
+
+class Camera:
+    """
+    The part of the world shown in the window. The camera centres on whatever it follows, usually the player's car,
+    but stops at the edges of the world rather than show anything beyond them. Its offset is kept in whole pixels so
+    that sprites and the background line up exactly.
+    """
+
+    size: tuple[int, int]           # size of the window
+    world_size: tuple[int, int]     # size of the world
+    offset: tuple[int, int]         # world position of the top left corner of the window
+
+    def __init__(self, size: tuple[int, int], world_size: tuple[int, int]) -> None:
+        """
+        Initializer
+
+        :param size: (w, h) of the window
+        :param world_size: (w, h) of the world
+        """
+
+        self.size = size
+        self.world_size = world_size
+        self.offset = (0, 0)
+
+    @property
+    def view(self) -> pygame.Rect:
+        """
+        The area of the world in the window
+        """
+
+        return pygame.Rect(self.offset, self.size)
+
+    def follow(self, pos: pymunk.Vec2d) -> bool:
+        """
+        Centre the camera on pos, as far as the edges of the world allow
+
+        :param pos: position in the world
+        :return: true iff the camera moved
+        """
+
+        x = min(max(round(pos[0] - self.size[0] / 2), 0), max(self.world_size[0] - self.size[0], 0))
+        y = min(max(round(pos[1] - self.size[1] / 2), 0), max(self.world_size[1] - self.size[1], 0))
+
+        moved = (x, y) != self.offset
+        self.offset = (x, y)
+
+        return moved
+
+    def to_world(self, pos: tuple[float, float]) -> pymunk.Vec2d:
+        """
+        Convert a position in the window, e.g. of the mouse, to a position in the world
+
+        :param pos: (x, y) in the window
+        :return: position in the world
+        """
+
+        return pymunk.Vec2d(pos[0] + self.offset[0], pos[1] + self.offset[1])
+
+    def to_screen(self, pos: tuple[float, float]) -> tuple[float, float]:
+        """
+        Convert a position in the world to a position in the window
+
+        :param pos: (x, y) in the world
+        :return: (x, y) in the window
+        """
+
+        return pos[0] - self.offset[0], pos[1] - self.offset[1]
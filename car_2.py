@@ -6,6 +6,7 @@ from typing import Union
 from weapon import Weapon
 from entities import HealthEntity
 from sprite import Sprite
+from rotation_cache import ROTATIONS
 from constants import *
 
 
@@ -24,6 +25,7 @@ class Car2(HealthEntity):
     pos: pymunk.Vec2d
     sprite: Sprite
     wep: Union[Weapon, None]
+    indexed = True
 
     def __init__(self, space: pymunk.Space, mass: int, pos: pymunk.Vec2d, max_hp: int, image: pygame.image, poly=None) -> None:
         """
@@ -58,26 +60,14 @@ class Car2(HealthEntity):
         self.body = pymunk.Body(mass, moment)
         self.body.position = pos
         self.shape = pymunk.Poly(self.body, vertices)
+        self.shape.filter = pymunk.ShapeFilter(categories=CATEGORY_CAR)
+        self.shape.ent = self
 
         self.front_pivot_point = pymunk.Vec2d(0, 30)
         self.back_pivot_point = pymunk.Vec2d(0, -30)
 
-        # create groove joints
-        self.front_wheel_groove = pymunk.GrooveJoint(self.space.static_body,
-                                                     self.body,
-                                                     self.body.position + self.front_pivot_point - pymunk.Vec2d(0, 20).rotated(self.steering_angle),
-                                                     self.body.position + self.front_pivot_point + pymunk.Vec2d(0, 20).rotated(self.steering_angle),
-                                                     self.front_pivot_point)
-
-        self.back_wheel_groove = pymunk.GrooveJoint(self.space.static_body,
-                                                    self.body,
-                                                    self.body.position + self.back_pivot_point - pymunk.Vec2d(0, 20).rotated(self.steering_angle),
-                                                    self.body.position + self.back_pivot_point + pymunk.Vec2d(0, 20).rotated(self.steering_angle),
-                                                    self.back_pivot_point)
-
         self.space.add(self.body, self.shape)
-        self.space.add(self.front_wheel_groove)
-        self.space.add(self.back_wheel_groove)
+        self.add_grooves()
 
     def set_weapon(self, wep: Weapon) -> None:
         """
@@ -135,43 +125,82 @@ class Car2(HealthEntity):
             else:
                 self.body.apply_force_at_local_point((0, mag), self.back_pivot_point)
 
-    def update_grooves(self) -> None:
+    def add_grooves(self) -> None:
         """
-        Updates the groove joints that define the car's movement
+        Create the groove joints that define the car's movement and add them to self.space
+
         :return: None
         """
 
-        # remove the grooves
-        self.space.remove(self.front_wheel_groove)
-        self.space.remove(self.back_wheel_groove)
-        # create groove joints
-        self.front_wheel_groove = pymunk.GrooveJoint(self.space.static_body,
-                                                     self.body,
-                                                     self.body.position + self.front_pivot_point.rotated(self.body.rotation_vector.angle) - pymunk.Vec2d(0, 20).rotated(self.steering_angle + self.body.rotation_vector.angle),
-                                                     self.body.position + self.front_pivot_point.rotated(self.body.rotation_vector.angle) + pymunk.Vec2d(0, 20).rotated(self.steering_angle + self.body.rotation_vector.angle),
+        self.front_wheel_groove = pymunk.GrooveJoint(self.space.static_body, self.body, (0, 0), (0, 1),
                                                      self.front_pivot_point)
-
-        self.back_wheel_groove = pymunk.GrooveJoint(self.space.static_body,
-                                                    self.body,
-                                                    self.body.position + self.back_pivot_point.rotated(self.body.rotation_vector.angle) - pymunk.Vec2d(0, 20).rotated(self.body.rotation_vector.angle),
-                                                    self.body.position + self.back_pivot_point.rotated(self.body.rotation_vector.angle) + pymunk.Vec2d(0, 20).rotated(self.body.rotation_vector.angle),
+        self.back_wheel_groove = pymunk.GrooveJoint(self.space.static_body, self.body, (0, 0), (0, 1),
                                                     self.back_pivot_point)
+        self.update_grooves()
+
+        self.space.add(self.front_wheel_groove, self.back_wheel_groove)
 
-        # replace the grooves
-        self.space.add(self.front_wheel_groove)
-        self.space.add(self.back_wheel_groove)
+    def update_grooves(self) -> None:
+        """
+        Moves the groove joints that define the car's movement to the car's current position and heading.
+        The joints are moved in place rather than rebuilt, so the solver keeps its warm start between ticks.
+        :return: None
+        """
+
+        angle = self.body.rotation_vector.angle
+        front = self.body.position + self.front_pivot_point.rotated(angle)
+        back = self.body.position + self.back_pivot_point.rotated(angle)
+        front_half = pymunk.Vec2d(0, 20).rotated(self.steering_angle + angle)
+        back_half = pymunk.Vec2d(0, 20).rotated(angle)
+
+        self.front_wheel_groove.groove_a = front - front_half
+        self.front_wheel_groove.groove_b = front + front_half
+        self.back_wheel_groove.groove_a = back - back_half
+        self.back_wheel_groove.groove_b = back + back_half
+
+    def transform(self) -> tuple[pymunk.Vec2d, float]:
+        """
+        The current position and angle of the body
 
-    def update_sprite(self) -> None:
+        :return: (position, angle in rads)
         """
-        Update the sprite
 
+        return self.body.position, self.body.angle
+
+    def save_transform(self) -> None:
+        """
+        Remember the current transform of the car and its weapon
+
+        :return: None
+        """
+
+        HealthEntity.save_transform(self)
+        if self.wep is not None:
+            self.wep.save_transform()
+
+    def update_sprite(self, alpha: float = 1.0) -> None:
+        """
+        Update the sprite of the car and its weapon
+
+        :param alpha: how far between the previous and current tick to draw the car
         :return: None
         """
 
-        self.body.position = pymunk.Vec2d(MAP_WIDTH / 2 - 20, MAP_HEIGHT / 2 - 20)
-        self.sprite.image = pygame.transform.rotate(self.sprite.original_image,
-                                                    -self.body.rotation_vector.angle_degrees)
-        self.sprite.rect = self.sprite.image.get_rect(center=self.body.position)
+        pos, angle = self.lerp_transform(alpha)
+        self.sprite.image = ROTATIONS.rotate(self.sprite.original_image, -math.degrees(angle))
+        self.sprite.rect = self.sprite.image.get_rect(center=pos)
+
+        if self.wep is not None:
+            self.wep.update_sprite(alpha)
+
+    def sprites(self) -> tuple[Sprite, ...]:
+        """
+        The sprites of the car and its weapon on top
+
+        :return: the sprites
+        """
+
+        return (self.sprite, self.wep.sprite) if self.wep is not None else (self.sprite,)
 
     def update(self) -> None:
         """
@@ -181,8 +210,9 @@ class Car2(HealthEntity):
 
         HealthEntity.update(self)
         self.pos = self.body.position
-        self.update_sprite()
         self.update_grooves()
-        self.wep.update()
         self.hp_bar.update()
-        self.wep.pos = self.pos
+
+        if self.wep is not None:
+            self.wep.update()
+            self.wep.pos = self.pos
@@ -0,0 +1,398 @@
+import json
+import math
+import os
+import pygame
+import pymunk
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Union, TYPE_CHECKING
+
+from constants import *
+from enemy import Target, MovingTarget
+from game_objects import Terrain
+from asset_cache import ASSETS
+
+if TYPE_CHECKING:
+    from game import Game
+
+
+class ChunkData:
+    """
+    The contents of one chunk of the world: static obstacles, the background under them and enemies to spawn.
+    Everything is prepared away from the main thread; the shapes aren't attached to a body or added to a space yet.
+    """
+
+    key: tuple[int, int]                        # (column, row) of the chunk
+    rect: pygame.Rect                           # area of the world the chunk covers
+    shapes: list[pymunk.Shape]                  # static shapes of the obstacles
+    background: pygame.Surface                  # the chunk's part of the background
+    spawns: list[dict]                          # enemies spawned the first time the chunk is loaded
+    nbytes: int                                 # rough memory use
+
+    def __init__(self, key: tuple[int, int], rect: pygame.Rect, polygons: list[list[tuple[float, float]]],
+                 background: pygame.Surface, spawns: list[dict]) -> None:
+        """
+        Initializer
+
+        :param key: (column, row) of the chunk
+        :param rect: area of the world the chunk covers
+        :param polygons: convex obstacles whose shapes belong to the chunk, as lists of vertices in world coordinates
+        :param background: the chunk's part of the background, the size of rect
+        :param spawns: enemies to spawn, in world coordinates
+        """
+
+        self.key = key
+        self.rect = rect
+        self.shapes = []
+        for vertices in polygons:
+            shape = pymunk.Poly(None, vertices)
+            shape.collision_type = COLLTYPE_WALL
+            shape.filter = pymunk.ShapeFilter(categories=CATEGORY_WALL)
+            self.shapes.append(shape)
+        self.background = background
+        self.spawns = spawns
+        self.nbytes = (background.get_width() * background.get_height() * background.get_bytesize() +
+                       sum(16 * len(vertices) for vertices in polygons))
+
+
+def draw_background(rect: pygame.Rect, polygons: list[list[tuple[float, float]]],
+                    tiles: list[tuple[pygame.Rect, tuple[int, int, int]]] = ()) -> pygame.Surface:
+    """
+    Draw the background of an area of the world
+
+    :param rect: area of the world
+    :param polygons: obstacles to draw, in world coordinates; they may reach outside rect
+    :param tiles: (area, colour) of patches of ground, in world coordinates
+    :return: the background, the size of rect
+    """
+
+    background = pygame.Surface(rect.size)
+    background.fill(WHITE)
+
+    for tile, colour in tiles:
+        background.fill(colour, tile.move(-rect.x, -rect.y))
+
+    for x in range(-rect.x % GRID_SPACING, rect.w, GRID_SPACING):
+        pygame.draw.line(background, LIGHT_GREY, (x, 0), (x, rect.h))
+    for y in range(-rect.y % GRID_SPACING, rect.h, GRID_SPACING):
+        pygame.draw.line(background, LIGHT_GREY, (0, y), (rect.w, y))
+
+    for vertices in polygons:
+        pygame.draw.polygon(background, GREY, [(x - rect.x, y - rect.y) for x, y in vertices])
+
+    return background
+
+
+def make_spawn(spawn: dict) -> Target:
+    """
+    Create the enemy described by a spawn point
+
+    :param spawn: {"kind": "target" or "moving_target", "pos": [x, y], "dest": [x, y] for moving targets,
+        "hp": max hp, "size": [w, h]}, in world coordinates
+    :return: the enemy
+    """
+
+    image = ASSETS.solid(tuple(spawn.get("size", (50, 50))), RED)
+    pos = pymunk.Vec2d(*spawn["pos"])
+    hp = spawn.get("hp", 1500)
+
+    if spawn.get("kind", "target") == "moving_target":
+        return MovingTarget(pos, pymunk.Vec2d(*spawn["dest"]), hp, image)
+
+    return Target(pos, hp, image)
+
+
+class ChunkSource:
+    """
+    Where a ChunkManager gets the contents of chunks from. load is called from a worker thread, so it mustn't touch
+    the game, the display or anything else shared.
+    """
+
+    world_size: tuple[int, int]
+    chunk_size: int
+
+    def chunk_rect(self, key: tuple[int, int]) -> pygame.Rect:
+        """
+        The area of the world a chunk covers, clipped to the world
+
+        :param key: (column, row) of the chunk
+        :return: the area
+        """
+
+        return pygame.Rect(key[0] * self.chunk_size, key[1] * self.chunk_size,
+                           self.chunk_size, self.chunk_size).clip((0, 0), self.world_size)
+
+    def load(self, key: tuple[int, int]) -> ChunkData:
+        """
+        Prepare the contents of a chunk
+
+        :param key: (column, row) of the chunk
+        :return: ChunkData
+        """
+
+        raise NotImplementedError
+
+
+class DirectoryChunkSource(ChunkSource):
+    """
+    Chunks stored as one JSON file each in a directory, next to a world.json of the form
+    {"world_size": [w, h], "chunk_size": px}. The file of the chunk in column c and row r is named c_r.json:
+
+        {"obstacles": [[[x, y], ...], ...], "tiles": [{"rect": [x, y, w, h], "colour": [r, g, b]}, ...],
+         "spawns": [{"kind": "target", "pos": [x, y], "hp": 1500}, ...]}
+
+    with every coordinate relative to the top left of the chunk. Chunks without a file are empty.
+    """
+
+    path: str
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializer
+
+        :param path: directory of the chunk files
+        """
+
+        self.path = path
+
+        with open(os.path.join(path, "world.json")) as f:
+            world = json.load(f)
+
+        self.world_size = tuple(world["world_size"])
+        self.chunk_size = world.get("chunk_size", CHUNK_SIZE)
+
+    def load(self, key: tuple[int, int]) -> ChunkData:
+        """
+        Read and prepare the contents of a chunk
+
+        :param key: (column, row) of the chunk
+        :return: ChunkData
+        """
+
+        rect = self.chunk_rect(key)
+
+        try:
+            with open(os.path.join(self.path, f"{key[0]}_{key[1]}.json")) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+
+        def to_world(point):
+            return point[0] + rect.x, point[1] + rect.y
+
+        outlines = [[to_world(point) for point in vertices] for vertices in data.get("obstacles", [])]
+        # a Poly is always convex, so concave obstacles are split into the convex pieces of a Terrain
+        polygons = [piece for vertices in outlines for piece in Terrain(vertices).pieces]
+        tiles = [(pygame.Rect(tile["rect"]).move(rect.topleft), tuple(tile["colour"]))
+                 for tile in data.get("tiles", [])]
+
+        spawns = []
+        for spawn in data.get("spawns", []):
+            spawn = dict(spawn, pos=to_world(spawn["pos"]))
+            if "dest" in spawn:
+                spawn["dest"] = to_world(spawn["dest"])
+            spawns.append(spawn)
+
+        return ChunkData(key, rect, polygons, draw_background(rect, outlines, tiles), spawns)
+
+
+class ChunkManager:
+    """
+    Streams the chunks of a ChunkSource in and out of a game as the car moves. The chunks around the car, and the
+    one it is heading for, are prepared on a worker thread ahead of arrival: read, turned into shapes and drawn.
+    Once ready they are added to the game on the main thread, their shapes on the game's static body so that they
+    move along when the space is rebuilt. Chunks that are no longer wanted are evicted, most distant first, once
+    the loaded chunks take up more than the memory budget.
+
+    Without a worker thread, chunks are loaded on the spot instead, which keeps headless, recorded and replayed
+    games deterministic.
+    """
+
+    game: 'Game'
+    source: ChunkSource
+    radius: int                 # chunks kept loaded around the one the car is in
+    lookahead: float            # seconds of travel ahead that chunks are loaded for
+    budget: int                 # bytes of loaded chunks above which unwanted ones are evicted
+    loaded: dict[tuple[int, int], ChunkData]
+    pending: dict[tuple[int, int], Future]
+    spawned: set[tuple[int, int]]   # chunks whose enemies have been spawned, which only happens once
+    executor: Union[ThreadPoolExecutor, None]
+    columns: int
+    rows: int
+
+    def __init__(self, game: 'Game', source: ChunkSource, threaded: bool = True, radius: int = CHUNK_LOAD_RADIUS,
+                 lookahead: float = CHUNK_LOOKAHEAD, budget: int = CHUNK_MEMORY_BUDGET) -> None:
+        """
+        Initializer
+
+        :param game: the game the chunks are loaded into
+        :param source: where the chunks come from
+        :param threaded: prepare chunks on a worker thread rather than on the spot
+        :param radius: chunks kept loaded around the one the car is in
+        :param lookahead: seconds of travel ahead that chunks are loaded for
+        :param budget: bytes of loaded chunks above which unwanted ones are evicted
+        """
+
+        self.game = game
+        self.source = source
+        self.radius = radius
+        self.lookahead = lookahead
+        self.budget = budget
+        self.loaded = {}
+        self.pending = {}
+        self.spawned = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunks") if threaded else None
+        self.columns = math.ceil(source.world_size[0] / source.chunk_size)
+        self.rows = math.ceil(source.world_size[1] / source.chunk_size)
+
+    def key_at(self, pos: tuple[float, float]) -> tuple[int, int]:
+        """
+        The chunk a position in the world is in
+
+        :param pos: (x, y) in the world
+        :return: (column, row) of the chunk
+        """
+
+        return (min(max(int(pos[0] // self.source.chunk_size), 0), self.columns - 1),
+                min(max(int(pos[1] // self.source.chunk_size), 0), self.rows - 1))
+
+    def wanted(self, pos: tuple[float, float], velocity: tuple[float, float]) -> list[tuple[int, int]]:
+        """
+        The chunks that should be loaded, nearest first
+
+        :param pos: position of the car
+        :param velocity: velocity of the car
+        :return: (column, row) of every chunk
+        """
+
+        cx, cy = self.key_at(pos)
+        keys = {(x, y) for x in range(max(cx - self.radius, 0), min(cx + self.radius + 1, self.columns))
+                for y in range(max(cy - self.radius, 0), min(cy + self.radius + 1, self.rows))}
+        keys.add(self.key_at((pos[0] + velocity[0] * self.lookahead, pos[1] + velocity[1] * self.lookahead)))
+
+        return sorted(keys, key=lambda key: (max(abs(key[0] - cx), abs(key[1] - cy)), key))
+
+    def update(self, pos: tuple[float, float], velocity: tuple[float, float]) -> None:
+        """
+        Load the chunks around and ahead of the car, add any that have finished loading and evict what doesn't fit
+        in the budget. The chunk the car is in is waited for, so it never drives into missing obstacles.
+
+        :param pos: position of the car
+        :param velocity: velocity of the car
+        :return: None
+        """
+
+        wanted = self.wanted(pos, velocity)
+
+        for key in wanted:
+            if key in self.loaded or key in self.pending:
+                continue
+            if self.executor is None:
+                self.add(self.source.load(key))
+            else:
+                self.pending[key] = self.executor.submit(self.source.load, key)
+
+        here = wanted[0]
+        if here in self.pending:
+            self.pending[here].result()
+
+        for key in [key for key, future in self.pending.items() if future.done()]:
+            self.add(self.pending.pop(key).result())
+
+        self.evict(set(wanted), pos)
+
+    def add(self, chunk: ChunkData) -> None:
+        """
+        Add a prepared chunk to the game
+
+        :param chunk: the chunk
+        :return: None
+        """
+
+        for shape in chunk.shapes:
+            shape.body = self.game.static_body
+            self.game.space.add(shape)
+            self.game.track_extent(shape)
+
+        chunk.background = chunk.background.convert()
+        self.loaded[chunk.key] = chunk
+
+        if chunk.key not in self.spawned:
+            self.spawned.add(chunk.key)
+            for spawn in chunk.spawns:
+                self.game.add_target(make_spawn(spawn))
+
+    def remove(self, key: tuple[int, int]) -> None:
+        """
+        Take a chunk out of the game and forget it
+
+        :param key: (column, row) of the chunk
+        :return: None
+        """
+
+        chunk = self.loaded.pop(key)
+
+        if chunk.shapes:
+            self.game.space.remove(*chunk.shapes)
+        for shape in chunk.shapes:
+            shape.body = None
+
+    def evict(self, wanted: set[tuple[int, int]], pos: tuple[float, float]) -> None:
+        """
+        Remove the chunks most distant from pos that aren't wanted until the rest fit in the budget
+
+        :param wanted: chunks that are kept regardless
+        :param pos: position of the car
+        :return: None
+        """
+
+        used = sum(chunk.nbytes for chunk in self.loaded.values())
+        if used <= self.budget:
+            return
+
+        cx, cy = self.key_at(pos)
+        unwanted = sorted((key for key in self.loaded if key not in wanted),
+                          key=lambda key: max(abs(key[0] - cx), abs(key[1] - cy)), reverse=True)
+
+        for key in unwanted:
+            if used <= self.budget:
+                break
+            used -= self.loaded[key].nbytes
+            self.remove(key)
+
+    def draw(self, screen: pygame.Surface, area: pygame.Rect, offset: tuple[int, int]) -> None:
+        """
+        Copy the background of an area of the world onto the screen. Parts of it in chunks that aren't loaded are
+        left blank.
+
+        :param screen: surface to draw on
+        :param area: area of the world
+        :param offset: world position of the top left corner of the screen
+        :return: None
+        """
+
+        left, top = self.key_at(area.topleft)
+        right, bottom = self.key_at((area.right - 1, area.bottom - 1))
+
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                chunk = self.loaded.get((x, y))
+                part = area.clip(chunk.rect if chunk is not None else self.source.chunk_rect((x, y)))
+                dest = part.move(-offset[0], -offset[1])
+
+                if chunk is None:
+                    screen.fill(WHITE, dest)
+                else:
+                    screen.blit(chunk.background, dest, part.move(-chunk.rect.x, -chunk.rect.y))
+
+    def close(self) -> None:
+        """
+        Stop the worker thread, abandoning chunks still being prepared. Any chunks needed after that are loaded on
+        the spot.
+
+        :return: None
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.pending.clear()
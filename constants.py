@@ -1,4 +1,9 @@
 TICKRATE = 60
+MAX_FPS = 144               # frames rendered per second at most; 0 renders as fast as possible, busy-waiting
+
+# PHYSICS
+MAX_SUBSTEPS = 8            # physics substeps per tick when something moves fast enough to tunnel
+MAX_CATCH_UP_TICKS = 5      # most ticks simulated in one frame after a stall; any further lag is dropped
 
 # COLORS
 BLACK = (0, 0, 0)
@@ -9,10 +14,15 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 GRASS_GREEN = (154, 205, 50)
+LIGHT_GREY = (225, 225, 225)
 
 # GAME
-MAP_WIDTH = 1000
+MAP_WIDTH = 1000            # size of the window
 MAP_HEIGHT = 750
+WORLD_WIDTH = 4000          # size of the world, which scrolls past the window
+WORLD_HEIGHT = 3000
+GRID_SPACING = 100          # px between the lines drawn on the background
+CULL_MARGIN = 100           # px outside the view within which entities are still drawn
 
 # DIRECTIONS
 UP = 0
@@ -26,8 +36,58 @@ COLLTYPE_ROCKETPROJ = 11
 COLLTYPE_ENEM = 20
 COLLTYPE_WALL = 30
 
+# SHAPE FILTER CATEGORIES
+#   used to restrict spatial queries to a kind of shape; they don't affect which shapes collide
+CATEGORY_ENEM = 0b1
+CATEGORY_WALL = 0b10
+CATEGORY_CAR = 0b100
+CATEGORY_PROJ = 0b1000
+
+# AI DRIVING
+AI_THROTTLE = 10 ** 6       # same force as the player's accelerate
+AI_STEER_GAIN = 2           # steering angle per rad of heading error
+AI_BRAKE_DISTANCE = 150     # px from the target at which AI cars brake
+
+# SCENARIOS
+DEFAULT_SCENARIO = "scenarios/default.json"     # played by main.py, and source of the benchmark's weapons and assets
+
+# REPLAYS
+REPLAY_VERSION = 5
+REPLAY_KEYFRAME_SECONDS = 10    # seconds of game time between full game state keyframes
+
 # TARGETING
 OFF = -69
 
 # LASER LENGTH
 BIG_NUM = 999999999
+
+# RENDER MODES
+RENDER_FULL = "full"        # repaint and flip the whole window every frame
+RENDER_DIRTY = "dirty"      # only repaint the regions that sprites were or are drawn in, scrolling the rest with the camera
+
+# HUD
+HUD_TEXT_CACHE_SIZE = 512   # rendered strings kept by the HUD
+
+# SPRITE ROTATION
+ROTATION_RESOLUTION = 1     # degrees
+ROTATION_CACHE_SIZE = 4096
+
+# PROJECTILE POOLING
+PROJECTILE_POOL_SIZE = 256  # idle projectiles kept per weapon
+
+# BULLET BACKENDS
+BULLET_BACKEND_PYMUNK = "pymunk"    # every bullet is a pymunk body
+BULLET_BACKEND_NUMPY = "numpy"      # bullets live in the arrays of a BulletSystem
+BULLET_LIFETIME = 2                 # seconds
+BULLET_CHUNK = 1024                 # bullets hit tested at once by a BulletSystem
+
+# ENVIRONMENTS
+ENV_MAX_ENEMIES = 32            # enemies observed per environment
+ENV_MAX_PROJECTILES = 256       # projectiles observed per environment
+ENV_MAX_STEPS = 60 * TICKRATE   # steps before an episode is truncated
+
+# CHUNKS
+CHUNK_SIZE = 1024                   # px per side of a square chunk of the world
+CHUNK_LOAD_RADIUS = 1               # chunks kept loaded around the one the car is in
+CHUNK_LOOKAHEAD = 1.5               # seconds of travel ahead of the car that chunks are loaded for
+CHUNK_MEMORY_BUDGET = 64 * 2 ** 20  # bytes of loaded chunks above which the most distant are evicted
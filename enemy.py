@@ -1,9 +1,11 @@
+import math
 import pymunk
 import pygame
 
 from constants import *
 from entities import HealthEntity
 from sprite import Sprite
+from rotation_cache import ROTATIONS
 
 
 class Target(HealthEntity):
@@ -16,6 +18,7 @@ class Target(HealthEntity):
     sprite: Sprite
     max_hp: int
     hp: int
+    indexed = True
 
     def __init__(self, pos: pymunk.Vec2d, max_hp: int, image: pygame.image, poly=None):
         """
@@ -42,19 +45,30 @@ class Target(HealthEntity):
 
         self.shape = pymunk.Poly(self.body, vertices)
         self.shape.collision_type = COLLTYPE_ENEM
+        self.shape.filter = pymunk.ShapeFilter(categories=CATEGORY_ENEM)
 
         self.shape.ent = self
 
-    def update_sprite(self) -> None:
+    def transform(self) -> tuple[pymunk.Vec2d, float]:
+        """
+        The current position and angle of the body
+
+        :return: (position, angle in rads)
+        """
+
+        return self.body.position, self.body.angle
+
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return: None
         """
 
-        self.sprite.image = pygame.transform.rotate(self.sprite.original_image,
-                                                    -self.body.rotation_vector.angle_degrees)
-        self.sprite.rect = self.sprite.image.get_rect(center=self.body.position)
+        pos, angle = self.lerp_transform(alpha)
+        self.sprite.image = ROTATIONS.rotate(self.sprite.original_image, -math.degrees(angle))
+        self.sprite.rect = self.sprite.image.get_rect(center=pos)
 
     def update(self) -> None:
         """
@@ -65,7 +79,6 @@ class Target(HealthEntity):
 
         self.pos = self.body.position
         HealthEntity.update(self)
-        self.update_sprite()
 
 
 class MovingTarget(Target):
@@ -1,9 +1,12 @@
+import math
 import pygame.math
 import pygame
 import pymunk
+from typing import Union
 
 from constants import *
 from sprite import Sprite
+from asset_cache import ASSETS
 
 
 class GenericEntity:
@@ -14,6 +17,9 @@ class GenericEntity:
     sprite: 'Sprite'
     pos: pymunk.Vec2d
     a_pos: float
+    eid: Union[int, None]   # id given by the EntityRegistry of the game the entity is added to
+    prev_transform: Union[tuple[pymunk.Vec2d, float], None]     # transform at the start of the current tick
+    indexed = False     # whether the entity has a shape in the space, through which render finds it when in view
 
     def __init__(self, sprite: Sprite, pos=pymunk.Vec2d(0, 0), a_pos=0):
         """
@@ -23,11 +29,83 @@ class GenericEntity:
         self.sprite = sprite
         self.pos = pos
         self.a_pos = a_pos
+        self.eid = None
+        self.prev_transform = None
 
-    def update_sprite(self) -> None:
+    def transform(self) -> tuple[pymunk.Vec2d, float]:
+        """
+        The current position and angle the entity is drawn with
+
+        :return: (position, angle in rads)
+        """
+
+        return self.pos, self.a_pos
+
+    def save_transform(self) -> None:
+        """
+        Remember the current transform as the previous one, before the next tick changes it
+
+        :return: None
+        """
+
+        self.prev_transform = self.transform()
+
+    def lerp_transform(self, alpha: float) -> tuple[pymunk.Vec2d, float]:
+        """
+        Interpolate between the transform at the start of the tick and the current one
+
+        :param alpha: 0 for the previous transform, 1 for the current one
+        :return: (position, angle in rads)
+        """
+
+        pos, angle = self.transform()
+
+        if self.prev_transform is None or alpha >= 1:
+            return pos, angle
+
+        prev_pos, prev_angle = self.prev_transform
+        # turn the short way round
+        d_angle = (angle - prev_angle + math.pi) % (2 * math.pi) - math.pi
+
+        return pymunk.Vec2d(*prev_pos).interpolate_to(pos, alpha), prev_angle + d_angle * alpha
+
+    def cull_radius(self) -> float:
+        """
+        How far from pos the entity can be drawn, at any angle
+
+        :return: distance in px
+        """
+
+        return math.hypot(*self.sprite.original_image.get_size()) / 2
+
+    def in_view(self, view: pygame.Rect) -> bool:
+        """
+        Whether the entity could be drawn within view. Errs on the side of true, by CULL_MARGIN px, since the entity
+        is drawn somewhere between its previous and current position. Only used for entities that aren't indexed.
+
+        :param view: area of the world on the screen
+        :return: false if the entity can be skipped when rendering
+        """
+
+        reach = self.cull_radius() + CULL_MARGIN
+        x, y = self.pos
+
+        return view.left - reach < x < view.right + reach and view.top - reach < y < view.bottom + reach
+
+    def sprites(self) -> tuple[Sprite, ...]:
+        """
+        The sprites drawn for the entity, bottom first
+
+        :return: the sprites
+        """
+
+        return (self.sprite,)
+
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return: None
         """
 
@@ -66,10 +144,11 @@ class HealthEntity(GenericEntity):
         self.hp = max_hp
         self.hp_bar = HealthBar(self)
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return: None
         """
 
@@ -112,14 +191,16 @@ class HealthBar(GenericEntity):
         new_pos = pymunk.Vec2d(self.health_entity.pos[0], self.health_entity.pos[1] - self.health_entity.sprite.rect.h / 1.4)
         GenericEntity.__init__(self, Sprite(new_pos, image), new_pos)
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
-        Update the sprite
+        Update the sprite, following the interpolated position of the health entity
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return:
         """
 
-        self.sprite.rect = self.sprite.image.get_rect(center=self.pos)
+        pos, _ = self.health_entity.lerp_transform(alpha)
+        self.sprite.rect = self.sprite.image.get_rect(center=(pos[0], pos[1] - self.health_entity.sprite.rect.h / 1.4))
 
     def update(self) -> None:
         """
@@ -133,7 +214,6 @@ class HealthBar(GenericEntity):
 
         self.sprite.image.fill(RED)
         self.pos = pymunk.Vec2d(self.health_entity.pos[0], self.health_entity.pos[1] - self.health_entity.sprite.rect.h / 1.4)
-        self.update_sprite()
 
         pygame.draw.rect(self.sprite.image, GREEN, [0, 0, length, self.h])
 
@@ -147,14 +227,16 @@ class Reticle(GenericEntity):
         GenericEntity.__init__(self, sprite, pos)
         self.current_target = current_target
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
-        Update the sprite
+        Update the sprite, following the interpolated position of the target
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return:
         """
 
-        self.sprite.rect = self.sprite.image.get_rect(center=self.pos)
+        pos, _ = self.current_target.lerp_transform(alpha)
+        self.sprite.rect = self.sprite.image.get_rect(center=pos)
 
     def update(self) -> None:
         """
@@ -164,19 +246,17 @@ class Reticle(GenericEntity):
         """
 
         self.pos = self.current_target.pos
-        self.update_sprite()
 
 
 class Explosion(GenericEntity):
     def __init__(self, radius: float, pos: pymunk.Vec2d):
-        image = pygame.Surface([2 * radius, 2 * radius], pygame.SRCALPHA)
-        pygame.draw.circle(image, RED, (radius, radius), radius)
+        image = ASSETS.circle(radius, RED)
 
         GenericEntity.__init__(self, Sprite(pos, image), pos)
 
         self.lifespan = TICKRATE / 5    # 0.2 second
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         pass
 
     def update(self) -> None:
@@ -194,16 +274,17 @@ class LaserContact(GenericEntity):
 
         :return:
         """
-        self.update_sprite()
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return:
         """
 
-        self.sprite.rect = self.sprite.image.get_rect(center=self.pos)
+        pos, _ = self.lerp_transform(alpha)
+        self.sprite.rect = self.sprite.image.get_rect(center=pos)
 
 
 
@@ -0,0 +1,296 @@
+import random
+import numpy as np
+import pygame
+import pymunk
+from typing import Callable, Union
+
+from constants import *
+from game import Game
+from entities import HealthEntity
+from enemy import Target, MovingTarget
+from projectiles import Rocket
+from input_source import InputState, InputSource
+from camera import Camera
+from scenario import make_car, make_headless_game, target_image
+
+
+# columns of the observation arrays
+CAR_FIELDS = ("x", "y", "angle", "vx", "vy", "angular_velocity", "steering", "hp")
+ENEMY_FIELDS = ("x", "y", "vx", "vy", "hp")
+PROJECTILE_FIELDS = ("x", "y", "vx", "vy", "angle", "damage", "rocket")
+
+# columns of the action array
+ACTION_FIELDS = ("throttle", "steer", "aim_x", "aim_y", "fire")
+
+
+class ActionInput(InputSource):
+    """
+    Input set directly from an agent's action instead of read from pygame's event queue
+    """
+
+    keys: frozenset[int]
+    aim: tuple[float, float]    # where to aim, in the world
+    fire: bool
+    camera: Union[Camera, None]     # camera of the game being played, to put the aim on the screen
+
+    def __init__(self) -> None:
+        """
+        Initializer
+        """
+
+        self.keys = frozenset()
+        self.aim = (0, 0)
+        self.fire = False
+        self.camera = None
+
+    def set_action(self, action: np.ndarray) -> None:
+        """
+        Turn an action into the input of the next tick. Throttle and steering are mapped onto the game's digital
+        controls: above 0.5 holds W or D, below -0.5 holds S or A.
+
+        :param action: one row of ACTION_FIELDS
+        :return: None
+        """
+
+        throttle, steer, aim_x, aim_y, fire = action.tolist()
+
+        keys = set()
+        if throttle > 0.5:
+            keys.add(pygame.K_w)
+        elif throttle < -0.5:
+            keys.add(pygame.K_s)
+        if steer > 0.5:
+            keys.add(pygame.K_d)
+        elif steer < -0.5:
+            keys.add(pygame.K_a)
+
+        self.keys = frozenset(keys)
+        self.aim = (aim_x, aim_y)
+        self.fire = fire > 0.5
+
+    def begin_tick(self, game: Game) -> None:
+        """
+        Called by the game at the start of every tick, before the input is polled
+
+        :param game: the game
+        :return: None
+        """
+
+        self.camera = game.camera
+
+    def poll(self) -> InputState:
+        """
+        Get the input for the current tick
+
+        :return: InputState
+        """
+
+        # the game takes the mouse position on the screen, and turns it back into a point in the world
+        mouse_pos = self.camera.to_screen(self.aim) if self.camera is not None else self.aim
+
+        return InputState(self.keys, mouse_pos, (self.fire, False, False))
+
+
+def make_game(seed: int, weapon: str = "machine_gun", n_enemies: int = 5, moving: float = 0.5) -> Game:
+    """
+    Build the default environment: a free car in the middle of the map and enemies scattered around it
+
+    :param seed: seed for the placement of the enemies
+    :param weapon: one of scenario.WEAPONS
+    :param n_enemies: number of enemies
+    :param moving: fraction of the enemies that are MovingTargets
+    :return: the game
+    """
+
+    rng = random.Random(seed)
+
+    game = make_headless_game()
+    game.set_car(make_car(game.space, pymunk.Vec2d(MAP_WIDTH / 2, MAP_HEIGHT / 2), weapon))
+
+    image = target_image()
+
+    for i in range(n_enemies):
+        pos = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+        if i < round(n_enemies * moving):
+            dest = pymunk.Vec2d(rng.uniform(50, MAP_WIDTH - 50), rng.uniform(50, MAP_HEIGHT - 50))
+            game.add_target(MovingTarget(pos, dest, 1500, image))
+        else:
+            game.add_target(Target(pos, 1500, image))
+
+    return game
+
+
+class VecEnv:
+    """
+    n Games stepped in lockstep, for training agents. Every step takes one action per game and gives back batched
+    observations in NumPy arrays that are allocated once and filled in place, so the arrays returned by reset and
+    step are the same objects every time and have to be copied to be kept.
+
+    The reward of a step is the damage done to enemies during it. An episode ends when every enemy is dead, or is
+    truncated after max_steps; either way the game is reset straight away and the observation returned for it is the
+    first of the next episode.
+    """
+
+    n: int
+    make: Callable[[int], Game]     # builds the game of an episode from its seed
+    max_steps: int
+    games: list[Game]
+    inputs: list[ActionInput]
+    enemies: list[list[HealthEntity]]   # the enemies each game's episode started with
+    hp_left: np.ndarray                 # (n,) total hp of each game's enemies after the last step
+    steps: np.ndarray                   # (n,) steps into each game's episode
+    seed: int
+    episodes: int                       # episodes started so far, across all games
+    obs: dict[str, np.ndarray]
+    rewards: np.ndarray
+    terminated: np.ndarray
+    truncated: np.ndarray
+
+    def __init__(self, n: int, make: Callable[[int], Game] = make_game, max_steps: int = ENV_MAX_STEPS,
+                 max_enemies: int = ENV_MAX_ENEMIES, max_projectiles: int = ENV_MAX_PROJECTILES) -> None:
+        """
+        Initializer
+
+        :param n: number of games
+        :param make: builds a headless game from a seed
+        :param max_steps: steps after which an episode is truncated
+        :param max_enemies: enemies observed per game; any more are left out
+        :param max_projectiles: projectiles observed per game; any more are left out
+        """
+
+        self.n = n
+        self.make = make
+        self.max_steps = max_steps
+        self.games = [None] * n
+        self.inputs = [ActionInput() for _ in range(n)]
+        self.enemies = [[] for _ in range(n)]
+        self.hp_left = np.zeros(n)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.seed = 0
+        self.episodes = 0
+
+        self.obs = {
+            "car": np.zeros((n, len(CAR_FIELDS))),
+            "weapon_angle": np.zeros(n),
+            "enemies": np.zeros((n, max_enemies, len(ENEMY_FIELDS))),
+            "enemy_mask": np.zeros((n, max_enemies), dtype=bool),
+            "projectiles": np.zeros((n, max_projectiles, len(PROJECTILE_FIELDS))),
+            "projectile_mask": np.zeros((n, max_projectiles), dtype=bool),
+        }
+        self.rewards = np.zeros(n)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+
+    def reset(self, seed: Union[int, None] = None) -> dict[str, np.ndarray]:
+        """
+        Start a new episode in every game
+
+        :param seed: seed of the first game's episode; later episodes count up from it
+        :return: the observations
+        """
+
+        if seed is not None:
+            self.seed = seed
+        self.episodes = 0
+
+        for i in range(self.n):
+            self.reset_game(i)
+            self.observe(i)
+
+        return self.obs
+
+    def reset_game(self, i: int) -> None:
+        """
+        Start a new episode in game i
+
+        :param i: index of the game
+        :return: None
+        """
+
+        game = self.make(self.seed + self.episodes)
+        self.episodes += 1
+
+        game.input_source = self.inputs[i]
+        self.inputs[i].set_action(np.zeros(len(ACTION_FIELDS)))
+        self.games[i] = game
+        self.enemies[i] = list(game.enemies)
+        self.hp_left[i] = sum(enemy.hp for enemy in self.enemies[i])
+        self.steps[i] = 0
+
+    def step(self, actions: np.ndarray) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Advance every game by one tick
+
+        :param actions: (n, len(ACTION_FIELDS)) action of each game; aim_x and aim_y are a point in the game world
+        :return: the observations, (n,) rewards, (n,) whether each episode ended and (n,) whether each was truncated
+        """
+
+        for i, game in enumerate(self.games):
+            self.inputs[i].set_action(actions[i])
+            game.tick()
+            self.steps[i] += 1
+
+            hp_left = sum(max(enemy.hp, 0) for enemy in self.enemies[i])
+            self.rewards[i] = self.hp_left[i] - hp_left
+            self.hp_left[i] = hp_left
+
+            self.terminated[i] = not game.enemies
+            self.truncated[i] = not self.terminated[i] and self.steps[i] >= self.max_steps
+            if self.terminated[i] or self.truncated[i]:
+                self.reset_game(i)
+
+            self.observe(i)
+
+        return self.obs, self.rewards, self.terminated, self.truncated
+
+    def observe(self, i: int) -> None:
+        """
+        Fill in the observations of game i
+
+        :param i: index of the game
+        :return: None
+        """
+
+        game = self.games[i]
+        car = game.car
+        body = car.body
+
+        self.obs["car"][i] = (body.position.x, body.position.y, body.angle, body.velocity.x, body.velocity.y,
+                              body.angular_velocity, car.steering_angle, car.hp)
+        self.obs["weapon_angle"][i] = car.wep.a_pos if car.wep is not None else 0
+
+        enemies = self.obs["enemies"][i]
+        count = 0
+        for enemy in game.enemies:
+            if count == len(enemies):
+                break
+            enemies[count] = (enemy.pos.x, enemy.pos.y, enemy.body.velocity.x, enemy.body.velocity.y, enemy.hp)
+            count += 1
+        enemies[count:] = 0
+        self.obs["enemy_mask"][i, :count] = True
+        self.obs["enemy_mask"][i, count:] = False
+
+        projectiles = self.obs["projectiles"][i]
+        count = 0
+        for proj in game.entities.bucket("projectiles"):
+            if count == len(projectiles):
+                break
+            projectiles[count] = (proj.body.position.x, proj.body.position.y, proj.body.velocity.x,
+                                  proj.body.velocity.y, proj.body.angle, proj.damage, isinstance(proj, Rocket))
+            count += 1
+
+        if game.bullets is not None and count < len(projectiles):
+            # bullets of the vectorized backend are copied over in one go
+            bullets = game.bullets
+            m = min(bullets.count, len(projectiles) - count)
+            rows = projectiles[count:count + m]
+            rows[:, 0:2] = bullets.pos[:m]
+            rows[:, 2:4] = bullets.vel[:m]
+            rows[:, 4] = np.arctan2(-bullets.vel[:m, 0], bullets.vel[:m, 1])
+            rows[:, 5] = bullets.damage[:m]
+            rows[:, 6] = 0
+            count += m
+
+        projectiles[count:] = 0
+        self.obs["projectile_mask"][i, :count] = True
+        self.obs["projectile_mask"][i, count:] = False
@@ -1,18 +1,80 @@
+import os
+import time
 import pymunk
 import pymunk.pygame_util
 import pygame
 import math
-from typing import Union
-
-import shapely
+from typing import Union, TYPE_CHECKING
 
 from constants import *
 from sprite import Sprite
-from entities import GenericEntity, HealthEntity, Reticle, Explosion
+from entities import GenericEntity, HealthEntity, HealthBar, Reticle
 from car_2 import Car2
 from weapon import MachineGun, RocketLauncher, LaserCannon
-from projectiles import Projectile
+from projectiles import Projectile, Rocket
 from enemy import Target
+from input_source import InputState, InputSource, KeyboardMouseInput, ScriptedInput
+from profiler import FrameProfiler, NullProfiler
+from asset_cache import ASSETS
+from registry import EntityRegistry
+from bullet_system import BulletSystem
+from raycast import Raycaster
+from hud import Hud
+from camera import Camera
+from chunks import ChunkSource, ChunkManager, make_spawn
+from level import Level
+from game_objects import Terrain
+from ai import AIController
+from homing import track_rockets
+
+if TYPE_CHECKING:
+    from replay import ReplayWriter
+
+
+# spatial queries that only find enemies
+ENEMY_FILTER = pymunk.ShapeFilter(mask=CATEGORY_ENEM)
+# spatial queries that find the shapes of indexed entities
+VISIBLE_FILTER = pymunk.ShapeFilter(mask=CATEGORY_ENEM | CATEGORY_CAR | CATEGORY_PROJ)
+
+
+def shape_extent(shape: pymunk.Shape) -> float:
+    """
+    The thinnest dimension of a shape, i.e. how far something has to travel in one step to pass through it
+
+    :param shape: a Segment, Poly or Circle
+    :return: the extent in px
+    """
+
+    if isinstance(shape, pymunk.Poly):
+        vertices = shape.get_vertices()
+        edges = [abs(vertices[i] - vertices[i - 1]) for i in range(len(vertices))]
+        return min(edges) + 2 * shape.radius
+    elif isinstance(shape, pymunk.Circle):
+        return 2 * shape.radius
+
+    return 2 * shape.radius if shape.radius > 0 else abs(shape.b - shape.a)
+
+
+def copy_body(body: pymunk.Body) -> pymunk.Body:
+    """
+    A new body in the same state as one that isn't in a space, without the bias velocity the solver leaves on a body
+    in contact for its next step, which pymunk neither exposes nor clears
+
+    :param body: a dynamic body
+    :return: the copy
+    """
+
+    copy = pymunk.Body(body.mass, body.moment)
+    copy.center_of_gravity = body.center_of_gravity
+    # the position is of the centre of gravity rotated by the angle, so the angle has to be set first
+    copy.angle = body.angle
+    copy.position = body.position
+    copy.velocity = body.velocity
+    copy.angular_velocity = body.angular_velocity
+    copy.force = body.force
+    copy.torque = body.torque
+
+    return copy
 
 
 class Game:
@@ -23,128 +85,242 @@ class Game:
     space: pymunk.Space
     done: bool
     size: tuple[int, int]
+    world_size: tuple[int, int]
+    camera: Camera
+    chunks: Union[ChunkManager, None]
+    terrain: list[Terrain]
     car: Union[Car2, None]
-    ents: list[GenericEntity]
-    enemies: list[HealthEntity]
-    projs: list[Projectile]
-
-    def __init__(self, width: int, height: int) -> None:
+    entities: EntityRegistry
+    headless: bool
+    input_source: InputSource
+    tick_count: int
+    tick_dt: float          # seconds of simulated time per tick
+    max_fps: int            # frame cap of the windowed loop, 0 for none
+    profiler: Union[FrameProfiler, NullProfiler]
+    bullets: Union[BulletSystem, None]
+
+    def __init__(self, width: int, height: int, headless: bool = False,
+                 input_source: Union[InputSource, None] = None,
+                 profiler: Union[FrameProfiler, None] = None,
+                 bullet_backend: str = BULLET_BACKEND_PYMUNK,
+                 render_mode: str = RENDER_FULL, tickrate: int = TICKRATE, max_fps: int = MAX_FPS,
+                 recorder: Union['ReplayWriter', None] = None,
+                 world_width: int = WORLD_WIDTH, world_height: int = WORLD_HEIGHT,
+                 chunk_source: Union[ChunkSource, None] = None, level: Union[Level, None] = None) -> None:
         """
         Initializer
 
         :param width: width of the screen
         :param height: height of the screen
+        :param headless: run without a visible window, without rendering and without capping the tick rate
+        :param input_source: where the player input comes from; the keyboard and mouse by default, or an idle
+            script when headless
+        :param profiler: records spans of every phase of the game loop when given
+        :param bullet_backend: BULLET_BACKEND_PYMUNK to simulate machine gun bullets as pymunk bodies, or
+            BULLET_BACKEND_NUMPY to simulate them in a vectorized BulletSystem
+        :param render_mode: RENDER_FULL to repaint the whole window every frame, or RENDER_DIRTY to only repaint
+            the regions that changed
+        :param tickrate: physics ticks per second of simulated time
+        :param max_fps: frames rendered per second at most, 0 for uncapped; frames between ticks are interpolated
+        :param recorder: records the input of every tick, and keyframes of the game state, into a replay
+        :param world_width: width of the world, which is walled in and scrolls past the screen
+        :param world_height: height of the world
+        :param chunk_source: streams the static obstacles, background and enemies of the world in chunks around the
+            car, instead of the whole world being held at once; the world is then the size of the source's
+        :param level: terrain and enemies to add to the world all at once; the world is then the size of the level's
         """
 
+        self.headless = headless
+        if headless:
+            # sprites still need a display surface to convert_alpha against, so use SDL's dummy driver
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+        if input_source is None:
+            input_source = ScriptedInput(lambda tick: InputState()) if headless else KeyboardMouseInput()
+        self.input_source = input_source
+        self.recorder = recorder
+        self.tick_count = 0
+        self.tick_dt = 1 / tickrate
+        self.max_fps = max_fps
+        self.min_extent = math.inf      # thinnest shape added to the space so far
+        self.profiler = profiler if profiler is not None else NullProfiler()
+
         pygame.init()
-        self.space = pymunk.Space()
-        self.space.damping = 0.7
-
-        # add walls
-        # Create a ground shape (a segment in this case)
-        bottom_wall_shape = pymunk.Segment(self.space.static_body, (0, 0), (0, height), 1)
-        bottom_wall_shape.collision_type = COLLTYPE_WALL
-        self.space.add(bottom_wall_shape)
-
-        # Create other walls or boundaries as needed
-        # Example: A left wall
-        left_wall_shape = pymunk.Segment(self.space.static_body, (0, height), (width, height), 1)
-        left_wall_shape.collision_type = COLLTYPE_WALL
-        self.space.add(left_wall_shape)
-
-        # Example: A right wall
-        right_wall_shape = pymunk.Segment(self.space.static_body, (width, height), (width, 0), 1)
-        right_wall_shape.collision_type = COLLTYPE_WALL
-        self.space.add(right_wall_shape)
-
-        # Example: A ceiling
-        top_wall_shape = pymunk.Segment(self.space.static_body, (width, 0), (0, 0), 1)
-        top_wall_shape.collision_type = COLLTYPE_WALL
-        self.space.add(top_wall_shape)
+        self.space = self.create_space()
 
-        # collision handlers
-        def bullet_coll(arbiter, space, data):
-            # neat trick, if we add an attribute to the pymunk.Shape attribute in the enemy and proj initializer, we can get the entities associated easily
-            proj = arbiter.shapes[0].ent
-            enemy = arbiter.shapes[1].ent
+        # walls hang off a static body of their own rather than the space's, so they can be moved to a new space
+        self.static_body = pymunk.Body(body_type=pymunk.Body.STATIC)
+        self.space.add(self.static_body)
 
-            enemy.hp -= proj.damage
-            self.delete_proj(proj)
+        if chunk_source is not None:
+            self.world_size = chunk_source.world_size
+        elif level is not None:
+            self.world_size = level.world_size
+        else:
+            self.world_size = (world_width, world_height)
+        self.add_walls()
 
-            return True
+        self.terrain = []
+        if level is not None:
+            self.add_terrain(level.terrain)
 
-        bullet_handler = self.space.add_collision_handler(COLLTYPE_BULLETPROJ, COLLTYPE_ENEM)
-        bullet_handler.begin = bullet_coll
+        self.done = False
+        self.size = (width, height)
+        self.screen = pygame.display.set_mode(self.size)
+        self.camera = Camera(self.size, self.world_size)
+        self.clock = pygame.time.Clock()
 
-        def rocket_coll(arbiter, space, data):
-            proj = arbiter.shapes[0].ent
+        self.render_mode = render_mode
+        # everything static is drawn once onto the background, which is copied back over whatever moved
+        #   streamed worlds draw theirs a chunk at a time
+        #   a worker thread would add chunks at ticks that depend on timing, so games that are headless, recorded or
+        #   replayed load them on the spot
+        threaded = not headless and recorder is None and not input_source.replaying
+        self.chunks = ChunkManager(self, chunk_source, threaded=threaded) if chunk_source is not None else None
+        self.background = self.make_background() if self.chunks is None else None
+        self.drawn_rects = []           # areas of the screen drawn over last frame
+        self.drawn_offset = None        # camera offset of the last frame
+        self.full_redraw = True         # whether the next frame has to repaint the whole window
+        self.hud = Hud()
+        self.last_keys = frozenset()    # keys held down last tick, to detect key presses
 
-            for enemy in self.enemies:
-                if abs(enemy.pos - proj.pos) <= proj.explosion_radius:
-                    enemy.hp -= proj.damage
-                    # assume that the enemy has a body
-                    enemy.body.apply_impulse_at_local_point((enemy.pos - proj.pos).normalized() * proj.explosion_force)
+        self.car = None
+        self.entities = EntityRegistry()
+        self.bullets = BulletSystem(self.world_size) if bullet_backend == BULLET_BACKEND_NUMPY else None
+        self.raycaster = Raycaster(self.space)
+        self.ai = AIController()
 
-            self.add_entity(proj.explode())
-            self.delete_proj(proj)
-            #TODO: fix a bug where if the rocket goes right between the middle of two entities and explodes, tries to remove x not in list
+        self.reticle = None
 
-            return True
+        if level is not None:
+            self.add_targets([make_spawn(spawn) for spawn in level.spawns])
 
-        rocket_handler = self.space.add_collision_handler(COLLTYPE_ROCKETPROJ, COLLTYPE_ENEM)
-        rocket_handler.begin = rocket_coll
+        # can set title later
 
-        def bullet_wall_coll(arbiter, space, data):
-            proj = arbiter.shapes[0].ent
-            self.delete_proj(proj)
+    def add_walls(self) -> None:
+        """
+        Wall in the world along its edges
 
-            return True
+        :return: None
+        """
 
-        bullet_wall_handler = self.space.add_collision_handler(COLLTYPE_BULLETPROJ, COLLTYPE_WALL)
-        bullet_wall_handler.begin = bullet_wall_coll
+        w, h = self.world_size
+        for a, b in (((0, 0), (0, h)), ((0, h), (w, h)), ((w, h), (w, 0)), ((w, 0), (0, 0))):
+            wall = pymunk.Segment(self.static_body, a, b, 1)
+            wall.collision_type = COLLTYPE_WALL
+            wall.filter = pymunk.ShapeFilter(categories=CATEGORY_WALL)
+            self.space.add(wall)
+            self.track_extent(wall)
 
-        rocket_wall_handler = self.space.add_collision_handler(COLLTYPE_ROCKETPROJ, COLLTYPE_WALL)
-        rocket_wall_handler.begin = rocket_coll
+    def add_terrain(self, terrain: list[Terrain]) -> None:
+        """
+        Add static obstacles. They are only drawn by make_background, so have to be added before it is called.
 
-        self.done = False
-        self.size = (width, height)
-        self.screen = pygame.display.set_mode(self.size)
-        self.clock = pygame.time.Clock()
-        self.all_sprites_group = pygame.sprite.Group()
+        :param terrain: the obstacles
+        :return: None
+        """
 
-        self.car = None
-        self.ents = []
-        self.enemies = []
-        self.projs = []
+        for obstacle in terrain:
+            shapes = obstacle.make_shapes(self.static_body)
+            self.space.add(*shapes)
+            for shape in shapes:
+                self.track_extent(shape)
 
-        self.reticle = None
+        self.terrain += terrain
 
-        # can set title later
+    def make_background(self) -> pygame.Surface:
+        """
+        Draw everything static in the world once, for render to copy the part in view from
+
+        :return: the background of the whole world
+        """
+
+        background = pygame.Surface(self.world_size).convert()
+        background.fill(WHITE)
+
+        w, h = self.world_size
+        for x in range(GRID_SPACING, w, GRID_SPACING):
+            pygame.draw.line(background, LIGHT_GREY, (x, 0), (x, h))
+        for y in range(GRID_SPACING, h, GRID_SPACING):
+            pygame.draw.line(background, LIGHT_GREY, (0, y), (w, y))
+
+        for obstacle in self.terrain:
+            obstacle.draw(background)
+
+        return background
+
+    @property
+    def ents(self):
+        """
+        Every entity in the game
+        """
+
+        return self.entities
+
+    @property
+    def enemies(self):
+        """
+        Every enemy in the game
+        """
+
+        return self.entities.bucket("enemies")
+
+    @property
+    def projs(self):
+        """
+        Every projectile in the game
+        """
+
+        return self.entities.bucket("projectiles")
 
     def set_car(self, car: Car2) -> None:
         """
-        Adds a car to self.cars
+        Adds the car controlled by the player
 
         :param car: Car to add
         :return: None
         """
 
         self.car = car
-        self.all_sprites_group.add(car.sprite)
-        self.all_sprites_group.add(car.wep.sprite)
-        self.ents.append(car)
+        self.add_car(car)
+
+    def add_car(self, car: Car2, ai: bool = False) -> None:
+        """
+        Adds a car. The car adds its own body to the space when it is created.
+
+        :param car: Car to add
+        :param ai: whether the car is driven by self.ai
+        :return: None
+        """
+
+        buckets = ("cars", "ai_cars") if ai else ("cars",)
+        self.entities.add(car, *buckets)
+        self.track_extent(car.shape)
 
         self.add_entity(car.hp_bar)
 
-    def add_entity(self, ent: GenericEntity) -> None:
+    def drive_ai(self) -> None:
+        """
+        Steer and accelerate every AI car towards the player's car, or the middle of the world if there is none
+
+        :return: None
+        """
+
+        target = self.car.body.position if self.car is not None else (self.world_size[0] / 2, self.world_size[1] / 2)
+        self.ai.drive(list(self.entities.bucket("ai_cars")), target)
+
+    def add_entity(self, ent: GenericEntity, *buckets: str) -> None:
         """
         Add an Entity
 
         :param ent: Entity to add
+        :param buckets: names of the registry buckets to file the entity into
         :return:
         """
-        self.all_sprites_group.add(ent.sprite)
-        self.ents.append(ent)
+        # render tests entities without a shape one by one, save health bars which are drawn with their entity
+        if not ent.indexed and not isinstance(ent, HealthBar):
+            buckets += ("unindexed",)
+        self.entities.add(ent, *buckets)
 
     def delete_entity(self, ent: GenericEntity) -> None:
         """
@@ -154,8 +330,45 @@ class Game:
         :return: None
         """
 
-        self.all_sprites_group.remove(ent.sprite)
-        self.ents.remove(ent)
+        self.entities.remove(ent)
+
+    def destroy(self, ent: GenericEntity) -> bool:
+        """
+        Queue an Entity for deletion once it is safe to do so, e.g. from inside a collision callback. The queue is
+        drained after every physics step and after the entities update.
+
+        :param ent: Entity to delete
+        :return: false if the Entity isn't in the game or was already queued
+        """
+
+        return self.entities.queue_removal(ent)
+
+    def flush_destroyed(self) -> None:
+        """
+        Delete every Entity queued by destroy()
+
+        :return: None
+        """
+
+        for ent in self.entities.drain():
+            if self.entities.in_bucket(ent, "enemies"):
+                self.delete_target(ent)
+                self.delete_entity(ent.hp_bar)
+            elif self.entities.in_bucket(ent, "projectiles"):
+                self.delete_proj(ent)
+            else:
+                self.delete_entity(ent)
+
+    def track_extent(self, shape: pymunk.Shape) -> None:
+        """
+        Note the size of a shape added to the space, for choosing how many physics substeps are needed.
+        The minimum is never raised again when shapes are removed, which only errs towards more substeps.
+
+        :param shape: shape added to the space
+        :return: None
+        """
+
+        self.min_extent = min(self.min_extent, shape_extent(shape))
 
     def add_target(self, target: Target) -> None:
         """
@@ -165,12 +378,28 @@ class Game:
         :return: None
         """
 
-        self.add_entity(target)
-        self.enemies.append(target)
+        self.add_entity(target, "enemies")
         self.space.add(target.body, target.shape)
+        self.track_extent(target.shape)
 
         self.add_entity(target.hp_bar)
 
+    def add_targets(self, targets: list[Target]) -> None:
+        """
+        Add many Targets at once, giving them the same ids as adding them one by one would, but adding all of their
+        bodies and shapes to the space in one call
+
+        :param targets: Targets to add
+        :return: None
+        """
+
+        for target in targets:
+            self.add_entity(target, "enemies")
+            self.add_entity(target.hp_bar)
+
+        self.space.add(*(obj for target in targets for obj in (target.body, target.shape)))
+        self.min_extent = min([self.min_extent] + [shape_extent(target.shape) for target in targets])
+
     def delete_target(self, target: Target) -> None:
         """
         Delete the Target
@@ -180,7 +409,6 @@ class Game:
         """
 
         self.delete_entity(target)
-        self.enemies.remove(target)
         self.space.remove(target.body, target.shape)
 
     def add_proj(self, proj: Projectile) -> None:
@@ -191,9 +419,10 @@ class Game:
         :return:
         """
 
-        self.add_entity(proj)
-        self.projs.append(proj)
+        buckets = ("projectiles", "rockets") if isinstance(proj, Rocket) else ("projectiles",)
+        self.add_entity(proj, *buckets)
         self.space.add(proj.body, proj.shape)
+        self.track_extent(proj.shape)
 
     def delete_proj(self, proj: Projectile) -> None:
         """
@@ -204,45 +433,129 @@ class Game:
         """
 
         self.delete_entity(proj)
-        self.projs.remove(proj)
         self.space.remove(proj.body, proj.shape)
+        # a recycled projectile is a new entity, so it gets a new id
+        proj.eid = None
+
+        if proj.pool is not None:
+            proj.pool.release(proj)
+
+    def enemies_near(self, pos: pymunk.Vec2d, radius: float) -> list[HealthEntity]:
+        """
+        Find the enemies whose shape comes within radius of pos, using the space's spatial index instead of scanning
+        every enemy. This is a superset of the enemies whose centre is within radius.
 
-    def render(self) -> None:
+        :param pos: centre of the query
+        :param radius: radius of the query
+        :return: the enemies found
+        """
+
+        return [info.shape.ent for info in self.space.point_query(pos, radius, ENEMY_FILTER)]
+
+    def render(self, alpha: float = 1.0) -> None:
         """
         Render graphics
 
+        :param alpha: how far the frame is between the previous and the current tick, from 0 to 1; sprites are drawn
+            interpolated between the two
         :return: None
         """
-        # render
-        self.screen.fill(WHITE)
+        if self.car is not None:
+            self.camera.follow(self.car.lerp_transform(alpha)[0])
+        view = self.camera.view
+
+        dirty = self.render_mode == RENDER_DIRTY and not self.full_redraw
+        erased = self.drawn_rects
+        scrolled = False
+        if dirty and view.topleft != self.drawn_offset:
+            # the screen already shows most of the new view, shifted; scroll it and repaint only the strips that
+            #   came into view
+            dx, dy = self.drawn_offset[0] - view.x, self.drawn_offset[1] - view.y
+            width, height = self.size
+            if abs(dx) < width and abs(dy) < height:
+                self.screen.scroll(dx, dy)
+                erased = [rect.move(dx, dy) for rect in self.drawn_rects]
+                if dx:
+                    self.draw_background(pygame.Rect(0 if dx > 0 else width + dx, 0, abs(dx), height))
+                if dy:
+                    self.draw_background(pygame.Rect(0, 0 if dy > 0 else height + dy, width, abs(dy)))
+                scrolled = True
+            else:
+                dirty = False
 
-        self.all_sprites_group.update()
-        self.all_sprites_group.draw(self.screen)
+        # render
+        if dirty:
+            # erase last frame's sprites
+            for rect in erased:
+                self.draw_background(rect)
+        else:
+            self.draw_background(self.screen.get_rect())
+
+        # entities out of view are neither updated nor drawn
+        offset = (-view.x, -view.y)
+        blits = []
+        with self.profiler.span("update_sprites", "render"):
+            # indexed entities are found through the space and bring their health bars along, while the few entities
+            #   without a shape are tested one by one; drawn in the order they were added, as when drawing them all
+            shown = [ent for ent in self.indexed_in(view) if ent in self.entities]
+            shown += [ent.hp_bar for ent in shown if isinstance(ent, HealthEntity)]
+            shown += [ent for ent in self.entities.bucket("unindexed") if ent.in_view(view)]
+            shown.sort(key=lambda ent: ent.eid)
+            for ent in shown:
+                ent.update_sprite(alpha)
+                blits += [(sprite.image, sprite.rect.move(offset)) for sprite in ent.sprites()]
+
+        drawn = self.screen.blits(blits, True)
+
+        if self.bullets is not None:
+            drawn += self.bullets.draw(self.screen, view)
 
         # debug pymunk
-        options = pymunk.pygame_util.DrawOptions(self.screen)
+        # options = pymunk.pygame_util.DrawOptions(self.screen)
         # self.space.debug_draw(options)
 
-        # debug speedometer todo remove later
-        font = pygame.font.SysFont(None, 48)
-        img = font.render(str(round(abs(self.car.body.velocity), 1)), True, BLUE)
-        self.screen.blit(img, (MAP_WIDTH - 120, MAP_HEIGHT - 80))
+        # debug speedometer
+        drawn += self.hud.draw(self.screen, self.car)
+
+        # update display
+        if dirty and not scrolled:
+            # both where things were and where they are now have changed
+            pygame.display.update(erased + drawn)
+        else:
+            # a scrolled screen has changed everywhere, even though little of it had to be repainted
+            pygame.display.flip()
+
+        self.drawn_rects = drawn
+        self.drawn_offset = view.topleft
+        self.full_redraw = False
 
-        body_a = (-self.car.body.rotation_vector.angle) % (2 * math.pi)
-        body_v = (math.pi / 2 - self.car.body.velocity.angle) % (2 * math.pi)
+    def draw_background(self, area: pygame.Rect) -> None:
+        """
+        Copy the background under an area of the screen onto it
 
-        if abs(body_a - body_v) < math.pi / 2:
-            img = font.render('front', True, BLUE)
-            self.screen.blit(img, (MAP_WIDTH - 120, MAP_HEIGHT - 160))
+        :param area: area of the screen
+        :return: None
+        """
+
+        offset = self.camera.offset
+        if self.chunks is not None:
+            self.chunks.draw(self.screen, area.move(offset), offset)
         else:
-            img = font.render('back', True, BLUE)
-            self.screen.blit(img, (MAP_WIDTH - 120, MAP_HEIGHT - 160))
+            self.screen.blit(self.background, area, area.move(offset))
+
+    def indexed_in(self, view: pygame.Rect) -> set[GenericEntity]:
+        """
+        Find the indexed entities that could be drawn within view, through the spatial index of the space rather than
+        by checking every entity
+
+        :param view: area of the world on the screen
+        :return: the entities
+        """
 
-        img = font.render(str(round(self.car.body.rotation_vector.angle, 4)), True, BLUE)
-        self.screen.blit(img, (MAP_WIDTH - 120, MAP_HEIGHT - 200))
+        bb = pymunk.BB(view.left - CULL_MARGIN, view.top - CULL_MARGIN,
+                       view.right + CULL_MARGIN, view.bottom + CULL_MARGIN)
 
-        # update display
-        pygame.display.flip()
+        return {shape.ent for shape in self.space.bb_query(bb, VISIBLE_FILTER)}
 
     def rl_track(self, x: int, y: int) -> None:
         """
@@ -252,11 +565,11 @@ class Game:
 
         if self.car.wep.current_target is None:
             self.car.wep.targeting_status = 0
-            for enemy in self.enemies:
-                # check if the mouse is within a radius of the enemy
-                if abs(pymunk.Vec2d(x, y) - enemy.pos) < 100:
-                    if self.car.wep.targeting_status == 0:
-                        self.car.wep.current_target = enemy
+            mouse = pymunk.Vec2d(x, y)
+            # check if the mouse is within a radius of an enemy, and pick the closest one
+            candidates = [enemy for enemy in self.enemies_near(mouse, 100) if abs(mouse - enemy.pos) < 100]
+            if candidates:
+                self.car.wep.current_target = min(candidates, key=lambda enemy: abs(mouse - enemy.pos))
         else:
             if abs(pymunk.Vec2d(x, y) - self.car.wep.current_target.pos) < 150:
                 # the target has been followed by the mouse for long enough, so set it to the current target
@@ -267,11 +580,7 @@ class Game:
                     self.car.wep.targeting_status = OFF
 
                     if self.reticle is None:
-                        reticle_image = pygame.image.load("assets/reticle1.png")
-                        reticle_image = pygame.transform.scale(reticle_image, [140, 100])
-                        reticle_pos = self.car.wep.current_target.pos
-                        reticle_sprite = Sprite(reticle_pos, reticle_image)
-                        self.reticle = Reticle(reticle_pos, reticle_sprite, self.car.wep.current_target)
+                        self.reticle = self.make_reticle(self.car.wep.current_target)
                     else:
                         self.reticle.current_target = self.car.wep.current_target
 
@@ -280,52 +589,39 @@ class Game:
                 else:
                     self.car.wep.targeting_status += 1
             else:
-                if self.car.wep.targeting_status == OFF and self.reticle in self.ents:
+                if self.car.wep.targeting_status == OFF and self.reticle in self.entities:
                     # delete reticle
                     self.delete_entity(self.reticle)
                     pass
                 self.car.wep.targeting_status = 0
                 self.car.wep.current_target = None
 
-    def laser_collide(self) -> tuple[pymunk.Vec2d, Union[HealthEntity, None]]:
+    def make_reticle(self, target: HealthEntity) -> Reticle:
         """
+        Create the reticle shown on the rocket launcher's locked target
 
-        :return:
+        :param target: the locked target
+        :return: Reticle
         """
 
-        self.car.wep: LaserCannon
+        reticle_image = ASSETS.image("assets/reticle1.png", (140, 100))
+        reticle_sprite = Sprite(target.pos, reticle_image)
+
+        return Reticle(target.pos, reticle_sprite, target)
 
-        contact = self.car.wep.laser.pos + pymunk.Vec2d(0, self.car.wep.laser.max_length).rotated(-self.car.wep.laser.a_pos)
-        line = shapely.LineString([self.car.wep.laser.pos, contact])
+    def laser_collide(self) -> tuple[pymunk.Vec2d, Union[HealthEntity, None]]:
+        """
+        Find where the laser beam stops: the first enemy or wall along it, or its maximum length
 
-        # determine the length of the laser if it were to hit a wall
-        barrier_definition = shapely.LineString([[0, 0], [MAP_WIDTH, 0], [MAP_WIDTH, MAP_HEIGHT], [0, MAP_HEIGHT], [0, 0]])
-        wall_contact = shapely.intersection(line, barrier_definition).coords
+        :return: the contact point and the enemy hit, if any
+        """
 
-        if len(wall_contact) == 1:
-            contact = wall_contact[0]
+        laser = self.car.wep.laser
+        end = laser.pos + pymunk.Vec2d(0, laser.max_length).rotated(-laser.a_pos)
 
-        # determine the length of the laser if it were to hit an enemy
-        closest_distance = abs(self.car.wep.laser.pos - contact)
-        closest_enemy = None
+        hit = self.raycaster.cast(laser.pos, end)
 
-        for enemy in self.enemies:
-            # print([point + enemy.pos for point in enemy.shape.get_vertices()])
-            poly = shapely.Polygon([point + enemy.pos for point in enemy.shape.get_vertices()])
-
-            if line.intersects(poly):
-                # collides
-                intersections = shapely.intersection(line, poly).coords
-                # get closest intersection
-                for point in intersections:
-                    dist = abs(self.car.wep.laser.pos - point)
-                    if dist < closest_distance:
-                        closest_distance = dist
-                        contact = point
-                        closest_enemy = enemy
-
-        # calculate and perform the laser's damage if it hits an enemy
-        return contact, closest_enemy
+        return hit.point, hit.ent
 
     def update(self) -> None:
         """
@@ -333,30 +629,176 @@ class Game:
         :return:
         """
 
-        phys_tick = 8
+        self.step_physics()
+        self.update_entities()
+
+    def create_space(self) -> pymunk.Space:
+        """
+        Create an empty space with the game's settings and collision handlers
+
+        :return: the space
+        """
+
+        space = pymunk.Space()
+        space.damping = 0.7
+
+        # collision handlers
+        def bullet_coll(arbiter, space, data):
+            # neat trick, if we add an attribute to the pymunk.Shape attribute in the enemy and proj initializer, we can get the entities associated easily
+            with self.profiler.span("bullet_coll", "collision"):
+                proj = arbiter.shapes[0].ent
+                enemy = arbiter.shapes[1].ent
+
+                # the bullet already hit something else during this step
+                if not self.destroy(proj):
+                    return False
+
+                enemy.hp -= proj.damage
+
+            return True
+
+        bullet_handler = space.add_collision_handler(COLLTYPE_BULLETPROJ, COLLTYPE_ENEM)
+        bullet_handler.begin = bullet_coll
+
+        def rocket_coll(arbiter, space, data):
+            with self.profiler.span("rocket_coll", "collision"):
+                proj = arbiter.shapes[0].ent
+
+                # the rocket already exploded on something else during this step
+                if not self.destroy(proj):
+                    return False
+
+                for enemy in self.enemies_near(proj.pos, proj.explosion_radius):
+                    if abs(enemy.pos - proj.pos) <= proj.explosion_radius:
+                        enemy.hp -= proj.damage
+                        # assume that the enemy has a body
+                        enemy.body.apply_impulse_at_local_point((enemy.pos - proj.pos).normalized() * proj.explosion_force)
+
+                self.add_entity(proj.explode(), "explosions")
+
+            return True
+
+        rocket_handler = space.add_collision_handler(COLLTYPE_ROCKETPROJ, COLLTYPE_ENEM)
+        rocket_handler.begin = rocket_coll
+
+        def bullet_wall_coll(arbiter, space, data):
+            with self.profiler.span("bullet_wall_coll", "collision"):
+                proj = arbiter.shapes[0].ent
+                if not self.destroy(proj):
+                    return False
+
+            return True
+
+        bullet_wall_handler = space.add_collision_handler(COLLTYPE_BULLETPROJ, COLLTYPE_WALL)
+        bullet_wall_handler.begin = bullet_wall_coll
+
+        rocket_wall_handler = space.add_collision_handler(COLLTYPE_ROCKETPROJ, COLLTYPE_WALL)
+        rocket_wall_handler.begin = rocket_coll
+
+        return space
+
+    def rebuild_space(self) -> None:
+        """
+        Move everything into a new space, throwing away what the solver remembers between steps: cached contacts,
+        the impulses accumulated in joints, the bias velocities of bodies, and the ids and insertion order of shapes,
+        which decide the order collisions are solved in. Entities get new bodies, added in the order of the registry,
+        so rebuilding two games in the same state gives two spaces that step identically.
+
+        :return: None
+        """
+
+        old = self.space
+        self.space = self.create_space()
+
+        static = [self.static_body] + [shape for shape in old.shapes if shape.body is self.static_body]
+        moved = [ent for ent in self.entities if hasattr(ent, "body") and ent.body.space is old]
+
+        old.remove(*old.constraints, *old.shapes, *old.bodies)
+
+        dynamic = []
+        for ent in moved:
+            ent.body = copy_body(ent.body)
+            ent.shape.body = ent.body
+            dynamic += [ent.body, ent.shape]
+
+        self.space.add(*static, *dynamic)
+
+        for car in self.entities.bucket("cars"):
+            car.space = self.space
+            car.add_grooves()
+
+        self.raycaster.space = self.space
+
+    def step_physics(self) -> None:
+        """
+        Advance the physics simulation by one tick
+
+        :return: None
+        """
+
+        phys_tick = self.substeps()
+
+        # pymunk clears forces after every step, so the forces applied this tick only act during the first substep.
+        #   Scale them so they give the same impulse as in a tick of MAX_SUBSTEPS substeps.
+        for car in self.entities.bucket("cars"):
+            car.body.force = car.body.force * (phys_tick / MAX_SUBSTEPS)
+            car.body.torque = car.body.torque * (phys_tick / MAX_SUBSTEPS)
 
         # tick physics
         for i in range(phys_tick):
-            self.space.step(1 / TICKRATE / phys_tick)
+            with self.profiler.span(f"space.step[{i}]", "physics"):
+                self.space.step(self.tick_dt / phys_tick)
+            self.flush_destroyed()
+
+        if self.bullets is not None:
+            with self.profiler.span("bullets.step", "physics"):
+                self.bullets.step(self.tick_dt, self.enemies, self.space)
+
+    def substeps(self) -> int:
+        """
+        Choose how many physics substeps this tick needs: enough that the fastest body moves less than the thinnest
+        shape per substep, so nothing tunnels, up to MAX_SUBSTEPS
+
+        :return: number of substeps
+        """
+
+        max_speed = max((abs(body.velocity) for body in self.space.bodies), default=0)
+
+        return max(1, min(MAX_SUBSTEPS, math.ceil(max_speed * self.tick_dt / self.min_extent)))
+
+    def update_entities(self) -> None:
+        """
+        Update every entity after the physics have been stepped, and clean up dead ones
+
+        :return: None
+        """
 
         # update all entities
         for ent in self.ents:
-            ent.update()
+            if self.profiler.enabled:
+                with self.profiler.span(f"{type(ent).__name__}.update", "entity"):
+                    ent.update()
+            else:
+                ent.update()
+
+        with self.profiler.span("track_rockets", "entity"):
+            track_rockets(self.entities.bucket("rockets"))
+
+        for enemy in self.enemies:
+            if enemy.hp <= 0:
+                self.destroy(enemy)
 
-            if isinstance(ent, Target):
-                if ent.hp <= 0:
-                    self.delete_target(ent)
-                    self.delete_entity(ent.hp_bar)
+                if self.car is not None and isinstance(self.car.wep, RocketLauncher):
+                    self.car.wep.current_target = None
 
-                    if isinstance(self.car.wep, RocketLauncher):
-                        self.car.wep.current_target = None
-            elif isinstance(ent, Explosion):
-                if ent.lifespan <= 0:
-                    self.delete_entity(ent)
+        for explosion in self.entities.bucket("explosions"):
+            if explosion.lifespan <= 0:
+                self.destroy(explosion)
 
         if self.reticle is not None and self.reticle.current_target.hp <= 0:
-            if self.reticle in self.ents:
-                self.delete_entity(self.reticle)
+            self.destroy(self.reticle)
+
+        self.flush_destroyed()
 
     def handle_input(self) -> None:
         """
@@ -365,31 +807,40 @@ class Game:
         :return: None
         """
 
+        state = self.input_source.poll()
+        if self.recorder is not None:
+            self.recorder.record(state)
+
         # handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.done = True
+        if state.quit:
+            self.done = True
 
         # handle keyboard
-        #   better to handle this way to account for holding down key
-        #   presses
-        keys = pygame.key.get_pressed()
+        keys = state.keys
+
+        if pygame.K_F3 in keys and pygame.K_F3 not in self.last_keys:
+            self.hud.toggle()
+        self.last_keys = keys
 
-        if keys[pygame.K_w]:
+        # nothing to control, e.g. when only AI cars are driving
+        if self.car is None:
+            return
+
+        if pygame.K_w in keys:
             self.car.accelerate(10 ** 6)
-        if keys[pygame.K_s]:
+        if pygame.K_s in keys:
             self.car.accelerate(-10 ** 6)
 
         th = 0
-        if keys[pygame.K_d]:
+        if pygame.K_d in keys:
             th += self.car.max_steering
-        if keys[pygame.K_a]:
+        if pygame.K_a in keys:
             th -= self.car.max_steering
 
         self.car.steer(th)
 
         # handle mouse
-        x, y = pygame.mouse.get_pos()
+        x, y = self.camera.to_world(state.mouse_pos)
 
         self.car.wep.a_pos = -(pymunk.Vec2d(x, y) - self.car.pos).angle + math.pi / 2
 
@@ -397,10 +848,15 @@ class Game:
         if isinstance(self.car.wep, RocketLauncher):
             self.rl_track(x, y)
 
-        m_buttons = pygame.mouse.get_pressed()
+        m_buttons = state.mouse_buttons
         if m_buttons[0]: # pressed down left mouse button
             # attempt to shoot
-            new_proj = self.car.wep.shoot()
+            if self.bullets is not None and isinstance(self.car.wep, MachineGun):
+                # the bullet goes into the vectorized backend rather than the space
+                self.car.wep.shoot_into(self.bullets)
+                new_proj = None
+            else:
+                new_proj = self.car.wep.shoot()
 
             # if weapon is a laser cannon
             if isinstance(self.car.wep, LaserCannon):
@@ -428,15 +884,81 @@ class Game:
                 self.delete_entity(self.car.wep.laser_contact)
                 self.car.wep.laser = None
 
-    def run_game_loop(self) -> None:
+    def tick(self) -> None:
         """
-        Runs the game loop
+        Advance the simulation by a single tick without rendering
 
         :return: None
         """
 
-        while not self.done:
+        self.input_source.begin_tick(self)
+        if self.recorder is not None:
+            self.recorder.begin_tick(self)
+
+        # remember where everything was, to draw frames in between this tick and the next
+        for ent in self.entities:
+            ent.save_transform()
+
+        # the mouse is over whatever is under it as of the last tick
+        if self.car is not None:
+            self.camera.follow(self.car.pos)
+
+        if self.chunks is not None:
+            with self.profiler.span("chunks.update", "chunks"):
+                if self.car is not None:
+                    self.chunks.update(self.car.body.position, self.car.body.velocity)
+                else:
+                    self.chunks.update(self.camera.view.center, (0, 0))
+
+        with self.profiler.span("handle_input", "input"):
             self.handle_input()
+        with self.profiler.span("drive_ai", "input"):
+            self.drive_ai()
+        with self.profiler.span("update", "physics"):
             self.update()
-            self.render()
-            self.clock.tick(TICKRATE)
+        self.tick_count += 1
+
+    def run_game_loop(self, max_ticks: Union[int, None] = None) -> None:
+        """
+        Runs the game loop. When headless, ticks run back to back with no rendering and no frame cap. Otherwise
+        ticks run at a fixed rate and every frame is drawn interpolated between the last two ticks.
+
+        :param max_ticks: stop after this many ticks, or run until the game is done if None
+        :return: None
+        """
+
+        if self.headless:
+            while not self.done and (max_ticks is None or self.tick_count < max_ticks):
+                with self.profiler.span("frame", "frame"):
+                    self.tick()
+            return
+
+        # the simulation advances in fixed ticks, as many as the time since the last frame covers
+        accumulator = 0.0
+        previous = time.perf_counter()
+
+        while not self.done and (max_ticks is None or self.tick_count < max_ticks):
+            now = time.perf_counter()
+            # after a stall, only catch up a few ticks instead of spiralling
+            accumulator += min(now - previous, MAX_CATCH_UP_TICKS * self.tick_dt)
+            previous = now
+
+            # a window that nothing reads the events of stops responding, e.g. while a replay plays; closing it
+            #   still ends the game
+            if not self.input_source.reads_events:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.done = True
+
+            with self.profiler.span("frame", "frame"):
+                while accumulator >= self.tick_dt and not self.done:
+                    self.tick()
+                    accumulator -= self.tick_dt
+
+                with self.profiler.span("render", "render"):
+                    self.render(accumulator / self.tick_dt)
+
+            self.clock.tick(self.max_fps)
+
+        if self.chunks is not None:
+            self.chunks.close()
@@ -1,18 +1,79 @@
-from physics_object import *
-from sprite import *
+import pygame
+import pymunk
+import pymunk.autogeometry
 
+from constants import *
 
-class Terrain(PhysicsObject):
+
+class Terrain:
     """
-    A terrain obstacle that can't move
+    A terrain obstacle that can't move. It isn't an entity: its shapes are added to the space on the static body and
+    it is drawn once onto the background, so it costs nothing per frame beyond the broadphase.
     """
 
-    def __init__(self, pos: list[int, int], poly: Polygon) -> None:
+    vertices: list[tuple[float, float]]         # outline in world coordinates, wound counterclockwise
+    pos: tuple[float, float]                    # centroid of the outline
+    bounds: tuple[float, float, float, float]   # (min x, min y, max x, max y) of the outline
+    pieces: list[list[tuple[float, float]]]     # convex parts of the outline, which may be concave itself
+
+    def __init__(self, vertices: list[tuple[float, float]]) -> None:
         """
         Initializer
 
-        :param pos: position of the obj
-        :param poly: size of the obj
+        :param vertices: vertices of the outline in world coordinates, in either winding
+        """
+
+        vertices = [(float(x), float(y)) for x, y in vertices]
+        if vertices[0] == vertices[-1]:
+            vertices.pop()
+
+        # twice the signed area, by the shoelace formula; pymunk wants it positive
+        area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(vertices, vertices[1:] + vertices[:1]))
+        if area < 0:
+            vertices.reverse()
+            area = -area
+        self.vertices = vertices
+
+        cx = sum((x0 + x1) * (x0 * y1 - x1 * y0) for (x0, y0), (x1, y1) in zip(vertices, vertices[1:] + vertices[:1]))
+        cy = sum((y0 + y1) * (x0 * y1 - x1 * y0) for (x0, y0), (x1, y1) in zip(vertices, vertices[1:] + vertices[:1]))
+        self.pos = (cx / (3 * area), cy / (3 * area))
+
+        xs = [x for x, _ in vertices]
+        ys = [y for _, y in vertices]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+        # the hull of a convex outline keeps every one of its vertices
+        hull = pymunk.autogeometry.to_convex_hull(vertices, 0)
+        if len(hull) - 1 == len(vertices):
+            self.pieces = [vertices]
+        else:
+            self.pieces = [[tuple(point) for point in piece[:-1]]
+                           for piece in pymunk.autogeometry.convex_decomposition(vertices + vertices[:1], 0)]
+
+    def make_shapes(self, body: pymunk.Body) -> list[pymunk.Shape]:
+        """
+        Create the shapes of the obstacle, one per convex piece
+
+        :param body: static body the shapes are attached to
+        :return: the shapes, not added to any space yet
+        """
+
+        shapes = []
+        for piece in self.pieces:
+            shape = pymunk.Poly(body, piece)
+            shape.collision_type = COLLTYPE_WALL
+            shape.filter = pymunk.ShapeFilter(categories=CATEGORY_WALL)
+            shapes.append(shape)
+
+        return shapes
+
+    def draw(self, surface: pygame.Surface, offset: tuple[int, int] = (0, 0)) -> None:
+        """
+        Draw the obstacle
+
+        :param surface: surface to draw on
+        :param offset: world position of the top left corner of surface
+        :return: None
         """
 
-        super().__init__(0, 0, pos, poly)
+        pygame.draw.polygon(surface, GREY, [(x - offset[0], y - offset[1]) for x, y in self.vertices])
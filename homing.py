@@ -0,0 +1,42 @@
+import math
+import numpy as np
+from typing import Iterable
+
+from projectiles import Rocket
+
+
+def track_rockets(rockets: Iterable[Rocket]) -> None:
+    """
+    Adjust the trajectory of every rocket that has a target, like Rocket.track does for one rocket, but with the
+    steering of all of them worked out in one NumPy pass. Each rocket turns tracking / 2 rads towards its target,
+    or not at all if the target is exactly behind it.
+
+    :param rockets: the rockets to steer; ones without a target are left alone
+    :return: None
+    """
+
+    homing = [rocket for rocket in rockets if rocket.target is not None]
+    if not homing:
+        return
+
+    data = np.array([(rocket.pos.x, rocket.pos.y, rocket.target.pos.x, rocket.target.pos.y,
+                      rocket.body.angle, rocket.body.velocity.x, rocket.body.velocity.y, rocket.tracking)
+                     for rocket in homing])
+    x, y, target_x, target_y, angle, vel_x, vel_y, tracking = data.T
+
+    rocket_angle = -(angle + math.pi / 2)
+    displacement_angle = math.pi - np.arctan2(target_y - y, target_x - x)
+    difference_angle = (displacement_angle - rocket_angle) % (2 * math.pi)
+
+    turn = np.where(difference_angle > math.pi, -tracking / 2,
+                    np.where(difference_angle == math.pi, 0, tracking / 2))
+
+    cos = np.cos(turn)
+    sin = np.sin(turn)
+    new_vel_x = vel_x * cos - vel_y * sin
+    new_vel_y = vel_x * sin + vel_y * cos
+
+    for rocket, d_angle, vx, vy in zip(homing, turn.tolist(), new_vel_x.tolist(), new_vel_y.tolist()):
+        if d_angle != 0:
+            rocket.body.angle += d_angle
+            rocket.body.velocity = (vx, vy)
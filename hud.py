@@ -0,0 +1,101 @@
+import math
+import pygame
+from typing import Union, TYPE_CHECKING
+
+from constants import *
+
+if TYPE_CHECKING:
+    from car_2 import Car2
+
+
+class Hud:
+    """
+    Debug overlay showing the car's speed, whether it is going forwards or backwards, and its angle.
+    The font is loaded once, rendered text is memoized by (string, colour), and the overlay is only recomposed when a
+    displayed value changes.
+    """
+
+    enabled: bool
+    font_size: int
+    font: Union[pygame.font.Font, None]
+    text_cache: dict[tuple[str, tuple[int, int, int]], pygame.Surface]
+    values: Union[tuple[str, str, str], None]       # the values currently composed into lines
+    lines: list[tuple[pygame.Surface, tuple[int, int]]]
+
+    def __init__(self, enabled: bool = True, font_size: int = 48) -> None:
+        """
+        Initializer
+
+        :param enabled: whether the overlay is drawn
+        :param font_size: size of the font
+        """
+
+        self.enabled = enabled
+        self.font_size = font_size
+        # loaded on first use so that headless games never touch the font system
+        self.font = None
+        self.text_cache = {}
+        self.values = None
+        self.lines = []
+
+    def toggle(self) -> None:
+        """
+        Show the overlay if it is hidden and hide it if it is shown
+
+        :return: None
+        """
+
+        self.enabled = not self.enabled
+
+    def text(self, string: str, colour: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Render a string, reusing the Surface if it has been rendered before
+
+        :param string: text to render
+        :param colour: colour of the text
+        :return: the rendered text
+        """
+
+        key = (string, colour)
+        surface = self.text_cache.get(key)
+
+        if surface is None:
+            if self.font is None:
+                self.font = pygame.font.SysFont(None, self.font_size)
+
+            surface = self.font.render(string, True, colour)
+            self.text_cache[key] = surface
+
+            # forget the oldest text once the cache is full
+            if len(self.text_cache) > HUD_TEXT_CACHE_SIZE:
+                del self.text_cache[next(iter(self.text_cache))]
+
+        return surface
+
+    def draw(self, screen: pygame.Surface, car: 'Car2') -> list[pygame.Rect]:
+        """
+        Draw the overlay for car
+
+        :param screen: surface to draw on
+        :param car: the car whose values are shown
+        :return: the areas drawn on
+        """
+
+        if not self.enabled or car is None:
+            return []
+
+        body_a = (-car.body.rotation_vector.angle) % (2 * math.pi)
+        body_v = (math.pi / 2 - car.body.velocity.angle) % (2 * math.pi)
+
+        values = (str(round(abs(car.body.velocity), 1)),
+                  'front' if abs(body_a - body_v) < math.pi / 2 else 'back',
+                  str(round(car.body.rotation_vector.angle, 4)))
+
+        if values != self.values:
+            self.values = values
+            speed, direction, angle = values
+            self.lines = [(self.text(speed, BLUE), (MAP_WIDTH - 120, MAP_HEIGHT - 80)),
+                          (self.text(direction, BLUE), (MAP_WIDTH - 120, MAP_HEIGHT - 160)),
+                          (self.text(angle, BLUE), (MAP_WIDTH - 120, MAP_HEIGHT - 200))]
+
+        return screen.blits(self.lines, True)
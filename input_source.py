@@ -0,0 +1,128 @@
+import pygame
+from typing import Union, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from game import Game
+
+
+# keys that Game.handle_input responds to
+CONTROL_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_F3)
+
+
+class InputState:
+    """
+    A snapshot of the player input consumed by Game.handle_input for a single tick
+    """
+
+    keys: frozenset[int]                    # pygame key codes currently held down
+    mouse_pos: tuple[int, int]              # mouse position in screen coordinates
+    mouse_buttons: tuple[bool, bool, bool]  # left, middle, right
+    quit: bool                              # whether the game should stop
+
+    def __init__(self, keys=frozenset(), mouse_pos=(0, 0), mouse_buttons=(False, False, False),
+                 quit=False) -> None:
+        """
+        Initializer
+
+        :param keys: pygame key codes currently held down
+        :param mouse_pos: mouse position (x, y)
+        :param mouse_buttons: pressed state of the left, middle and right mouse buttons
+        :param quit: whether the game should stop after this tick
+        """
+
+        self.keys = frozenset(keys)
+        self.mouse_pos = (int(mouse_pos[0]), int(mouse_pos[1]))
+        self.mouse_buttons = tuple(bool(b) for b in mouse_buttons)
+        self.quit = quit
+
+
+class InputSource:
+    """
+    Something that produces an InputState every tick
+    """
+
+    replaying = False       # whether the game has to play out exactly like the one the input was recorded from
+    reads_events = False    # whether polling empties pygame's event queue, which a window has to keep doing
+
+    def begin_tick(self, game: 'Game') -> None:
+        """
+        Called by the game at the start of every tick, before the input is polled
+
+        :param game: the game
+        :return: None
+        """
+
+    def poll(self) -> InputState:
+        """
+        Get the input for the current tick
+
+        :return: InputState
+        """
+
+        raise NotImplementedError
+
+
+class KeyboardMouseInput(InputSource):
+    """
+    Live input read from pygame's event queue, keyboard and mouse
+    """
+
+    reads_events = True
+
+    def poll(self) -> InputState:
+        """
+        Get the input for the current tick
+
+        :return: InputState
+        """
+
+        quit = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit = True
+
+        # better to handle this way to account for holding down key presses
+        pressed = pygame.key.get_pressed()
+
+        return InputState(frozenset(key for key in CONTROL_KEYS if pressed[key]),
+                          pygame.mouse.get_pos(),
+                          pygame.mouse.get_pressed(),
+                          quit)
+
+
+class ScriptedInput(InputSource):
+    """
+    Input played back from a precomputed list of InputStates, or generated by a function of the tick number.
+    Once a list runs out the game is told to quit.
+    """
+
+    script: Union[list[InputState], Callable[[int], InputState]]
+    tick: int
+
+    def __init__(self, script: Union[list[InputState], Callable[[int], InputState]]) -> None:
+        """
+        Initializer
+
+        :param script: a list of InputStates, one per tick, or a function mapping the tick number to an InputState
+        """
+
+        self.script = script
+        self.tick = 0
+
+    def poll(self) -> InputState:
+        """
+        Get the input for the current tick
+
+        :return: InputState
+        """
+
+        if callable(self.script):
+            state = self.script(self.tick)
+        elif self.tick < len(self.script):
+            state = self.script[self.tick]
+        else:
+            state = InputState(quit=True)
+
+        self.tick += 1
+
+        return state
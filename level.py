@@ -0,0 +1,81 @@
+import json
+import pygame
+
+from constants import *
+from game_objects import Terrain
+from chunks import ChunkSource, ChunkData, draw_background
+
+
+class Level(ChunkSource):
+    """
+    The static layout of a world: its size and the terrain in it. A Game given a Level adds all of the terrain at
+    once; handed to a ChunkManager instead, the Level is streamed a chunk at a time. Each obstacle's shapes then
+    belong to the chunk its centroid is in, while every chunk it overlaps draws it onto its background.
+
+    Levels are stored as JSON:
+
+        {"world_size": [w, h], "terrain": [[[x, y], ...], ...], "spawns": [{"kind": "target", "pos": [x, y]}, ...]}
+
+    with every coordinate in the world and spawns as in chunks.make_spawn.
+    """
+
+    terrain: list[Terrain]
+    spawns: list[dict]      # enemies to spawn, which a streamed level spawns with the chunk they are in
+
+    def __init__(self, world_size: tuple[int, int], terrain: list[Terrain], spawns: list[dict] = (),
+                 chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Initializer
+
+        :param world_size: (w, h) of the world
+        :param terrain: obstacles
+        :param spawns: enemies to spawn
+        :param chunk_size: px per side of a chunk when streamed
+        """
+
+        self.world_size = world_size
+        self.terrain = terrain
+        self.spawns = list(spawns)
+        self.chunk_size = chunk_size
+
+    def load(self, key: tuple[int, int]) -> ChunkData:
+        """
+        Prepare the contents of a chunk
+
+        :param key: (column, row) of the chunk
+        :return: ChunkData
+        """
+
+        rect = self.chunk_rect(key)
+
+        def owned(pos) -> bool:
+            return (int(pos[0] // self.chunk_size), int(pos[1] // self.chunk_size)) == key
+
+        polygons = []
+        drawn = []
+        for terrain in self.terrain:
+            if owned(terrain.pos):
+                polygons += terrain.pieces
+            min_x, min_y, max_x, max_y = terrain.bounds
+            if rect.colliderect(pygame.Rect(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)):
+                drawn.append(terrain.vertices)
+
+        spawns = [spawn for spawn in self.spawns if owned(spawn["pos"])]
+
+        return ChunkData(key, rect, polygons, draw_background(rect, drawn), spawns)
+
+
+def load_level(path: str) -> Level:
+    """
+    Read a level file
+
+    :param path: path of the JSON file
+    :return: the Level
+    """
+
+    with open(path) as f:
+        data = json.load(f)
+
+    terrain = [Terrain([tuple(point) for point in vertices]) for vertices in data.get("terrain", [])]
+
+    return Level(tuple(data["world_size"]), terrain, data.get("spawns", []), data.get("chunk_size", CHUNK_SIZE))
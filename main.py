@@ -1,58 +1,93 @@
-import pygame
-import pymunk
+import argparse
 
 from constants import *
-from game import Game
-from car_2 import Car2
-from enemy import Target, MovingTarget
-from weapon import MachineGun, RocketLauncher, LaserCannon
+from profiler import FrameProfiler
+from replay import ReplayWriter, ReplayReader, ReplayInput, seek, check_seek, file_digest
+from chunks import DirectoryChunkSource
+from level import load_level
+from scenario import load_scenario
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", default=DEFAULT_SCENARIO, metavar="SCENARIO_JSON",
+                        help="the cars, weapons and targets to start with")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="record a Chrome trace of the game loop and write it here on exit")
+    parser.add_argument("--tickrate", type=int, default=TICKRATE, help="physics ticks per second")
+    parser.add_argument("--max-fps", type=int, default=MAX_FPS,
+                        help="frames rendered per second at most, 0 for uncapped (keeps a core busy)")
+    parser.add_argument("--render-mode", choices=(RENDER_FULL, RENDER_DIRTY), default=RENDER_FULL,
+                        help="repaint the whole window every frame, or only what changed")
+    parser.add_argument("--record", metavar="REPLAY", help="record the input of the game into this replay file")
+    parser.add_argument("--replay", metavar="REPLAY", help="play back a replay file instead of reading input")
+    parser.add_argument("--seek", type=int, default=0, metavar="TICK", help="start the replay at this tick")
+    parser.add_argument("--check-seek", action="store_true",
+                        help="check that seeking the replay to --seek gives the same game as playing up to it, "
+                             "without opening a window")
+    parser.add_argument("--chunks", metavar="DIR", help="stream the world in chunks from the chunk files in DIR")
+    parser.add_argument("--level", metavar="LEVEL_JSON",
+                        help="build the world from this level file instead of the scenario's")
+    parser.add_argument("--stream", action="store_true", help="stream the level in chunks instead of all at once")
+    parser.add_argument("--bullet-backend", choices=(BULLET_BACKEND_PYMUNK, BULLET_BACKEND_NUMPY),
+                        default=BULLET_BACKEND_PYMUNK, help="how machine gun bullets are simulated")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+
+    # everything the game is built from, which a replay has to be played back with too
+    setup = {
+        "scenario": file_digest(args.scenario),
+        "level": file_digest(args.level or scenario.data.get("level")),
+        "stream": args.stream,
+        "chunks": args.chunks,
+        "bullet_backend": args.bullet_backend,
+    }
+
     # create game
-    game = Game(MAP_WIDTH, MAP_HEIGHT)
-
-    # load the image for the car
-    car_image = pygame.image.load("assets/car1.png")
-    # Resize
-    car_image = pygame.transform.scale(
-        car_image,
-        (45, 80),
-    )
-    init_pos = pymunk.Vec2d(100, 100)
-
-    # define the pygame sprite for the machine gun
-    gun_image = pygame.image.load("assets/machine_gun1.png")
-    gun_image = pygame.transform.scale(gun_image, [40, 70])
-
-    # define the pygame sprite for the rocket launcher
-    launcher_image = pygame.image.load("assets/rocket_launcher1.png")
-    launcher_image = pygame.transform.scale(launcher_image, [30, 70])
-
-    # define the pygame sprite for the laser cannon
-    cannon_image = pygame.image.load("assets/laser_cannon1.png")
-    cannon_image = pygame.transform.scale(cannon_image, [60, 85])
-
-    # create car and wep
-    car = Car2(game.space, 1000, init_pos, 250, car_image)
-    wep1 = MachineGun(init_pos, 20, 10, 500, pymunk.Vec2d(-4, 15), gun_image)
-    wep2 = RocketLauncher(init_pos, 300, 60, 500, pymunk.Vec2d(0, 18), launcher_image)
-    wep3 = LaserCannon(init_pos, 5, 0, None, 500, pymunk.Vec2d(0, 25), cannon_image)
-
-    # add wep to car and car to game
-    car.set_weapon(wep2)
-    game.set_car(car)
-
-    # add target
-    target_image = pygame.surface.Surface((50, 50))
-    target_image.fill(RED)
-    target1 = Target(pymunk.Vec2d(200, 200), 1500, target_image)
-    target2 = Target(pymunk.Vec2d(300, 200), 1500, target_image)
-    m_target = MovingTarget(pymunk.Vec2d(200, 200), pymunk.Vec2d(500, 500), 1500, target_image)
-
-    game.add_target(target1)
-    game.add_target(target2)
+    profiler = FrameProfiler() if args.profile else None
+    input_source = None
+    recorder = None
+    if args.replay:
+        reader = ReplayReader(args.replay)
+        mismatches = reader.setup_mismatches(setup)
+        if mismatches:
+            parser.error(f"{args.replay} was recorded with a different {', '.join(mismatches)}; "
+                         f"play it back with the --scenario, --level, --stream, --chunks and --bullet-backend it was "
+                         f"recorded with")
+        input_source = ReplayInput(reader)
+        # the replay only reproduces the game at the tick rate it was recorded at
+        args.tickrate = reader.tickrate
+    if args.record:
+        recorder = ReplayWriter(args.record, args.tickrate, setup=setup)
+
+    level = load_level(args.level) if args.level else None
+    chunk_source = DirectoryChunkSource(args.chunks) if args.chunks else None
+    if level is not None and args.stream:
+        chunk_source, level = level, None
+
+    if args.replay and args.check_seek:
+        matches = check_seek(lambda: scenario.build(headless=True, input_source=ReplayInput(reader),
+                                                    tickrate=args.tickrate, bullet_backend=args.bullet_backend,
+                                                    level=level, chunk_source=chunk_source),
+                             reader, args.seek)
+        print(f"seeking to tick {args.seek} {'matches' if matches else 'does not match'} playing up to it")
+        raise SystemExit(0 if matches else 1)
+
+    game = scenario.build(input_source=input_source, profiler=profiler, tickrate=args.tickrate, max_fps=args.max_fps,
+                          render_mode=args.render_mode, bullet_backend=args.bullet_backend, recorder=recorder,
+                          level=level, chunk_source=chunk_source)
 
     # run game
-    game.run_game_loop()
+    if args.replay and args.seek:
+        seek(game, reader, args.seek)
+    try:
+        game.run_game_loop()
+    finally:
+        # whatever was recorded up to a crash can still be played back
+        if recorder is not None:
+            recorder.close()
+
+    if profiler is not None:
+        profiler.export(args.profile)
 
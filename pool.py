@@ -0,0 +1,60 @@
+from constants import *
+from projectiles import Projectile
+
+
+class ProjectilePool:
+    """
+    Recycles deleted projectiles of one type so that firing doesn't allocate a new sprite and shape per shot.
+    A projectile is returned to its pool by Game.delete_proj once it has been removed from the space.
+    """
+
+    proj_type: type             # Projectile subclass that this pool creates
+    high_water: int             # maximum number of idle projectiles kept for reuse
+    idle: list[Projectile]
+    created: int                # number of projectiles allocated by this pool
+    reused: int                 # number of projectiles handed out again after being released
+
+    def __init__(self, proj_type: type, high_water: int = PROJECTILE_POOL_SIZE) -> None:
+        """
+        Initializer
+
+        :param proj_type: Projectile subclass to create, e.g. Bullet
+        :param high_water: maximum number of idle projectiles to hold on to; any more are left to the garbage
+            collector
+        """
+
+        self.proj_type = proj_type
+        self.high_water = high_water
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args) -> Projectile:
+        """
+        Get a projectile, recycling an idle one if there is one
+
+        :param args: arguments for the initializer of proj_type
+        :return: Projectile
+        """
+
+        if self.idle:
+            proj = self.idle.pop()
+            proj.reset(*args)
+            self.reused += 1
+        else:
+            proj = self.proj_type(*args)
+            proj.pool = self
+            self.created += 1
+
+        return proj
+
+    def release(self, proj: Projectile) -> None:
+        """
+        Return a projectile that has been removed from the game
+
+        :param proj: projectile to return
+        :return: None
+        """
+
+        if len(self.idle) < self.high_water:
+            self.idle.append(proj)
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    """
+    A timed region of code recorded by a FrameProfiler; use as a context manager
+    """
+
+    profiler: 'FrameProfiler'
+    name: str
+    cat: str
+    start: int
+
+    def __init__(self, profiler: 'FrameProfiler', name: str, cat: str) -> None:
+        """
+        Initializer
+
+        :param profiler: the profiler to record into
+        :param name: name of the span
+        :param cat: category of the span
+        """
+
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.start = 0
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.profiler.record(self.name, self.cat, self.start, time.perf_counter_ns() - self.start)
+
+
+class NullSpan:
+    """
+    A span that records nothing, handed out when profiling is off
+    """
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+class NullProfiler:
+    """
+    Profiler used when profiling is off; every span is a shared no-op
+    """
+
+    enabled = False
+
+    def __init__(self) -> None:
+        """
+        Initializer
+        """
+
+        self._span = NullSpan()
+
+    def span(self, name: str, cat: str = "game") -> NullSpan:
+        """
+        Get a no-op span
+
+        :param name: ignored
+        :param cat: ignored
+        :return: NullSpan
+        """
+
+        return self._span
+
+
+class FrameProfiler:
+    """
+    Records spans of the game loop and exports them as a Chrome trace, which can be opened in chrome://tracing or
+    https://ui.perfetto.dev
+    """
+
+    enabled = True
+    events: list[tuple[str, str, int, int, int]]    # (name, category, start ns, duration ns, thread id)
+    max_events: int
+
+    def __init__(self, max_events: int = 5_000_000) -> None:
+        """
+        Initializer
+
+        :param max_events: stop recording once this many spans have been recorded, to bound memory use
+        """
+
+        self.events = []
+        self.max_events = max_events
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name: str, cat: str = "game") -> Span:
+        """
+        Get a span that records the time spent inside its with block
+
+        :param name: name of the span, e.g. the function being timed
+        :param cat: category of the span, e.g. physics, collision or render
+        :return: Span
+        """
+
+        return Span(self, name, cat)
+
+    def record(self, name: str, cat: str, start: int, duration: int) -> None:
+        """
+        Record a finished span
+
+        :param name: name of the span
+        :param cat: category of the span
+        :param start: perf_counter_ns() at the start of the span
+        :param duration: length of the span in ns
+        :return: None
+        """
+
+        if len(self.events) < self.max_events:
+            self.events.append((name, cat, start, duration, threading.get_ident()))
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Total and mean time per span name, in milliseconds
+
+        :return: dict mapping span name to its count, total and mean
+        """
+
+        totals = {}
+        for name, _, _, duration, _ in self.events:
+            count, total = totals.get(name, (0, 0))
+            totals[name] = (count + 1, total + duration)
+
+        return {name: {"count": count, "total_ms": total / 1e6, "mean_ms": total / count / 1e6}
+                for name, (count, total) in totals.items()}
+
+    def export(self, path: str) -> None:
+        """
+        Write the recorded spans to path in the Chrome trace event format
+
+        :param path: file to write
+        :return: None
+        """
+
+        pid = os.getpid()
+        thread_ids = {}
+        trace_events = []
+
+        for name, cat, start, duration, thread in self.events:
+            tid = thread_ids.setdefault(thread, len(thread_ids))
+            trace_events.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            })
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -1,10 +1,15 @@
 import pymunk
 import pygame
 import math
+from typing import TYPE_CHECKING
 
 from constants import *
 from entities import GenericEntity, HealthEntity, Explosion
 from sprite import Sprite
+from rotation_cache import ROTATIONS
+
+if TYPE_CHECKING:
+    from pool import ProjectilePool
 
 
 class Projectile(GenericEntity):
@@ -16,6 +21,8 @@ class Projectile(GenericEntity):
     shape: pymunk.Shape
     damage: float
     pos: pymunk.Vec2d
+    pool: 'ProjectilePool'  # the pool this projectile is returned to once it is deleted, if any
+    indexed = True
 
     def __init__(self, damage: float, pos: pymunk.Vec2d, speed: int,
                  a_pos: float, image: pygame.image, poly=None) -> None:
@@ -50,19 +57,68 @@ class Projectile(GenericEntity):
         self.body.angle = -a_pos
 
         self.shape = pymunk.Poly(self.body, vertices)
+        self.shape.filter = pymunk.ShapeFilter(categories=CATEGORY_PROJ)
 
         self.shape.ent = self
+        self.pool = None
+
+    def reset(self, damage: float, pos: pymunk.Vec2d, speed: int,
+              a_pos: float, image: pygame.image, poly=None) -> None:
+        """
+        Reinitialize a recycled projectile that isn't in the space, reusing its sprite and shape.
+        Takes the same arguments as the initializer.
+
+        :return: None
+        """
+
+        self.pos = pos
+        self.a_pos = a_pos
+        self.damage = damage
+
+        self.sprite.original_image = image
+        self.sprite.image = image
+        self.sprite.rect = image.get_rect(center=pos)
+
+        # the vertices depend on where the rect rounds pos to, so they are recomputed even if the size is the same,
+        #   to give exactly the shape a new projectile would have
+        if poly is not None:
+            self.shape.unsafe_set_vertices(poly.exterior.coords)
+        else:
+            self.shape.unsafe_set_vertices([self.sprite.rect.topleft - self.pos,
+                                            self.sprite.rect.topright - self.pos,
+                                            self.sprite.rect.bottomright - self.pos,
+                                            self.sprite.rect.bottomleft - self.pos])
+
+        # the old body keeps solver state from the collision that ended its last life, which would push the first step
+        #   off course, so the projectile gets a new one
+        self.body = pymunk.Body(0.1, 1000)
+        self.body.position = pos
+        self.body.velocity = pymunk.Vec2d(0, speed).rotated(-a_pos)
+        self.body.angle = -a_pos
+        self.shape.body = self.body
+        # don't interpolate from where the projectile was in its previous life
+        self.prev_transform = None
+
+    def transform(self) -> tuple[pymunk.Vec2d, float]:
+        """
+        The current position and angle of the body
+
+        :return: (position, angle in rads)
+        """
+
+        return self.body.position, self.body.angle
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return: None
         """
 
-        self.sprite.image = pygame.transform.rotate(self.sprite.original_image,
-                                                    -self.body.rotation_vector.angle_degrees)
-        self.sprite.rect = self.sprite.image.get_rect(center=self.body.position)
+        pos, angle = self.lerp_transform(alpha)
+        self.sprite.image = ROTATIONS.rotate(self.sprite.original_image, -math.degrees(angle))
+        self.sprite.rect = self.sprite.image.get_rect(center=pos)
 
     def update(self) -> None:
         """
@@ -70,8 +126,6 @@ class Projectile(GenericEntity):
         :return: None
         """
 
-        self.update_sprite()
-
 
 class Bullet(Projectile):
     """
@@ -135,6 +189,21 @@ class Rocket(Projectile):
         self.explosion_radius = explosion_radius
         self.explosion_force = explosion_force
 
+    def reset(self, damage: float, explosion_radius: float, explosion_force: float, pos: pymunk.Vec2d, speed: int,
+              a_pos: float, image: pygame.image, target: HealthEntity, tracking: float, poly=None) -> None:
+        """
+        Reinitialize a recycled rocket. Takes the same arguments as the initializer.
+
+        :return: None
+        """
+
+        Projectile.reset(self, damage, pos, speed, a_pos, image, poly)
+
+        self.target = target
+        self.tracking = tracking
+        self.explosion_radius = explosion_radius
+        self.explosion_force = explosion_force
+
     def track(self) -> None:
         """
         Adjust the trajectory of the rocket based on the target's current position
@@ -166,14 +235,13 @@ class Rocket(Projectile):
 
     def update(self) -> None:
         """
-        Updates the rocket every tick and adjusts its body angle based on the track function
+        Updates the rocket every tick. Rockets in a Game are steered towards their target afterwards, all at once,
+        by homing.track_rockets.
         :return: None
         """
 
         self.pos = self.body.position
         Projectile.update(self)
-        if self.target is not None:
-            self.track()
 
 
 class Laser(Projectile):
@@ -182,6 +250,8 @@ class Laser(Projectile):
     """
 
     colour: [int, int, int]  # as of now the colour will be hardcoded
+    strip: pygame.Surface    # the beam tiled out to max_length once; the visible beam is a slice of it
+    indexed = False          # the beam has no shape
 
     def __init__(self, damage: float, pos: pymunk.Vec2d, a_pos: float, length: float, image: pygame.image, poly=None):
         """
@@ -209,6 +279,8 @@ class Laser(Projectile):
         self.length = 0
         self.max_length = length
         self.block_image = image
+        self.strip = f_image
+        self._sprite_key = None     # (length, a_pos) the rotated sprite image was made for
 
         if poly is None:
             vertices = [self.sprite.rect.topleft - self.pos,
@@ -218,21 +290,44 @@ class Laser(Projectile):
         else:
             vertices = poly.exterior.coords
 
-    def update_sprite(self) -> None:
+    def transform(self) -> tuple[pymunk.Vec2d, float]:
+        """
+        The current position and angle of the beam; the laser has no body
+
+        :return: (position, angle in rads)
+        """
+
+        return GenericEntity.transform(self)
+
+    def cull_radius(self) -> float:
+        """
+        How far from pos the beam can be drawn, which is from its origin out to its full length
+
+        :return: distance in px
+        """
+
+        return self.max_length + self.strip.get_width()
+
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the entity
         :return: None
         """
 
-        f_image = pygame.surface.Surface([self.block_image.get_width(), self.length], pygame.SRCALPHA)
-        for i in range(int(self.length // self.block_image.get_height()) + 1):
-            f_image.blit(self.block_image, (0, i * self.block_image.get_height()))
+        pos, a_pos = self.lerp_transform(alpha)
+        length = min(max(int(self.length), 0), self.strip.get_height())
+
+        # only slice and rotate the beam again if its length or direction changed
+        if self._sprite_key != (length, a_pos):
+            self._sprite_key = (length, a_pos)
+            # subsurface shares the strip's pixels, so no copy is made
+            self.sprite.original_image = self.strip.subsurface((0, 0, self.strip.get_width(), length))
+            self.sprite.image = pygame.transform.rotate(self.sprite.original_image, ((180 / math.pi) * a_pos))
 
-        self.sprite.original_image = f_image
         rot_off = pymunk.Vec2d(0, self.length / 2)
-        offset_rotated = rot_off.rotated(-self.a_pos)
+        offset_rotated = rot_off.rotated(-a_pos)
 
-        self.sprite.image = pygame.transform.rotate(self.sprite.original_image, ((180 / math.pi) * self.a_pos))
-        self.sprite.rect = self.sprite.image.get_rect(center=self.pos + offset_rotated)
+        self.sprite.rect = self.sprite.image.get_rect(center=pos + offset_rotated)
 
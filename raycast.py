@@ -0,0 +1,70 @@
+import pymunk
+from typing import Union
+
+from constants import *
+from entities import HealthEntity
+
+
+class RayHit:
+    """
+    Result of casting a ray
+    """
+
+    point: pymunk.Vec2d                 # where the ray stopped
+    ent: Union[HealthEntity, None]      # the enemy that stopped the ray, or None if it hit a wall or nothing
+    alpha: float                        # how far along the ray the hit is, from 0 (start) to 1 (end)
+
+    def __init__(self, point: pymunk.Vec2d, ent: Union[HealthEntity, None], alpha: float) -> None:
+        """
+        Initializer
+
+        :param point: where the ray stopped
+        :param ent: the enemy hit, if any
+        :param alpha: fraction of the ray travelled before the hit
+        """
+
+        self.point = point
+        self.ent = ent
+        self.alpha = alpha
+
+
+class Raycaster:
+    """
+    Casts rays through a pymunk space using its spatial index, so the cost of a ray scales with the shapes along it
+    rather than with every enemy in the game
+    """
+
+    space: pymunk.Space
+    filter: pymunk.ShapeFilter
+
+    def __init__(self, space: pymunk.Space, mask: int = CATEGORY_ENEM | CATEGORY_WALL) -> None:
+        """
+        Initializer
+
+        :param space: space to cast rays through
+        :param mask: shape categories that stop a ray
+        """
+
+        self.space = space
+        self.filter = pymunk.ShapeFilter(mask=mask)
+
+    def cast(self, start: pymunk.Vec2d, end: pymunk.Vec2d, radius: float = 0) -> RayHit:
+        """
+        Cast a ray from start to end and find the first shape it hits
+
+        :param start: start of the ray
+        :param end: end of the ray
+        :param radius: thickness of the ray
+        :return: RayHit; its point is end if nothing was hit
+        """
+
+        info = self.space.segment_query_first(start, end, radius, self.filter)
+
+        if info is None:
+            return RayHit(pymunk.Vec2d(*end), None, 1)
+
+        ent = None
+        if info.shape.filter.categories & CATEGORY_ENEM:
+            ent = info.shape.ent
+
+        return RayHit(info.point, ent, info.alpha)
@@ -0,0 +1,163 @@
+from typing import Iterator, ValuesView
+
+from entities import GenericEntity
+
+
+class EntityRegistry:
+    """
+    Every live entity in a Game, keyed by a stable id. Adding and removing are O(1), entities can be filed into
+    named buckets (e.g. all enemies) so that they can be visited without type checks, and removals requested while
+    the physics is stepping are queued until it is safe to perform them.
+
+    Iteration follows the order in which entities were added.
+    """
+
+    next_id: int
+    entities: dict[int, GenericEntity]
+    buckets: dict[str, dict[int, GenericEntity]]
+    memberships: dict[int, tuple[str, ...]]     # the buckets each entity is in
+    doomed: dict[int, GenericEntity]            # entities queued for removal
+
+    def __init__(self) -> None:
+        """
+        Initializer
+        """
+
+        self.next_id = 0
+        self.entities = {}
+        self.buckets = {}
+        self.memberships = {}
+        self.doomed = {}
+
+    def add(self, ent: GenericEntity, *buckets: str) -> int:
+        """
+        Add an entity, giving it an id if it doesn't have one yet. Adding an entity that is already registered only
+        files it into the extra buckets.
+
+        :param ent: entity to add
+        :param buckets: names of the buckets to file the entity into
+        :return: the entity's id
+        """
+
+        if ent.eid is None:
+            ent.eid = self.next_id
+            self.next_id += 1
+
+        self.entities[ent.eid] = ent
+
+        memberships = self.memberships.get(ent.eid, ())
+        for name in buckets:
+            self.buckets.setdefault(name, {})[ent.eid] = ent
+            if name not in memberships:
+                memberships += (name,)
+        self.memberships[ent.eid] = memberships
+
+        return ent.eid
+
+    def remove(self, ent: GenericEntity) -> None:
+        """
+        Remove an entity from the registry and all of its buckets; does nothing if it isn't registered
+
+        :param ent: entity to remove
+        :return: None
+        """
+
+        if self.entities.pop(ent.eid, None) is None:
+            return
+
+        for name in self.memberships.pop(ent.eid, ()):
+            del self.buckets[name][ent.eid]
+
+        self.doomed.pop(ent.eid, None)
+
+    def bucket(self, name: str) -> ValuesView[GenericEntity]:
+        """
+        Get a live view of the entities in a bucket
+
+        :param name: name of the bucket
+        :return: the entities in the bucket
+        """
+
+        return self.buckets.setdefault(name, {}).values()
+
+    def in_bucket(self, ent: GenericEntity, name: str) -> bool:
+        """
+        Check if an entity is in a bucket
+
+        :param ent: entity to check
+        :param name: name of the bucket
+        :return: true iff ent is in the bucket
+        """
+
+        return name in self.memberships.get(ent.eid, ())
+
+    def get(self, eid: int) -> GenericEntity:
+        """
+        Get an entity by its id
+
+        :param eid: id of the entity
+        :return: the entity, or None if there is no such entity
+        """
+
+        return self.entities.get(eid)
+
+    def queue_removal(self, ent: GenericEntity) -> bool:
+        """
+        Queue an entity to be removed by the next drain()
+
+        :param ent: entity to remove
+        :return: false if the entity isn't registered or was already queued
+        """
+
+        if ent.eid not in self.entities or ent.eid in self.doomed:
+            return False
+
+        self.doomed[ent.eid] = ent
+        return True
+
+    def is_queued(self, ent: GenericEntity) -> bool:
+        """
+        Check if an entity is queued for removal
+
+        :param ent: entity to check
+        :return: true iff ent is queued
+        """
+
+        return ent.eid in self.doomed
+
+    def drain(self) -> list[GenericEntity]:
+        """
+        Empty the removal queue. The entities are still registered; the caller is expected to remove them.
+
+        :return: the entities that were queued, in the order they were queued
+        """
+
+        doomed = list(self.doomed.values())
+        self.doomed.clear()
+
+        return doomed
+
+    def reorder(self, eids: list[int]) -> None:
+        """
+        Change the order in which entities are iterated, e.g. to match a saved game
+
+        :param eids: ids of the entities in their new order; registered entities missing from it go last
+        :return: None
+        """
+
+        order = [eid for eid in eids if eid in self.entities]
+        listed = set(order)
+        order += [eid for eid in self.entities if eid not in listed]
+
+        self.entities = {eid: self.entities[eid] for eid in order}
+        for name, bucket in self.buckets.items():
+            self.buckets[name] = {eid: bucket[eid] for eid in order if eid in bucket}
+
+    def __contains__(self, ent: GenericEntity) -> bool:
+        return ent is not None and self.entities.get(ent.eid) is ent
+
+    def __iter__(self) -> Iterator[GenericEntity]:
+        return iter(self.entities.values())
+
+    def __len__(self) -> int:
+        return len(self.entities)
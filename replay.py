@@ -0,0 +1,659 @@
+import hashlib
+import json
+import struct
+import pymunk
+from typing import Union, BinaryIO, Callable, TYPE_CHECKING
+
+from constants import *
+from entities import GenericEntity, HealthEntity, HealthBar, Reticle, Explosion, LaserContact
+from car_2 import Car2
+from enemy import Target, MovingTarget
+from projectiles import Projectile, Bullet, Rocket, Laser
+from weapon import Weapon, RocketLauncher, LaserCannon
+from input_source import CONTROL_KEYS, InputState, ScriptedInput
+from asset_cache import ASSETS
+
+if TYPE_CHECKING:
+    from game import Game
+
+# A replay file is a header and the setup of the recorded game, as JSON, followed by one record per tick. Every
+#   record is a one byte tag and its payload:
+#   an input record holds the InputState polled that tick, and a keyframe record, written before the input record
+#   of the tick it belongs to, holds the state of the game at the start of that tick as JSON. Keyframes are plain
+#   data rather than pickles, so that opening a replay from elsewhere can't run code.
+HEADER = struct.Struct("<4sHHII")   # magic, version, tickrate, keyframe interval, size of the setup
+INPUT = struct.Struct("<HiiB")      # bitmask of CONTROL_KEYS, mouse x, mouse y, bitmask of mouse buttons and quit
+KEYFRAME = struct.Struct("<II")     # tick, size of the encoded state
+MAGIC = b"RPLY"
+TAG_INPUT = b"I"
+TAG_KEYFRAME = b"K"
+
+
+def file_digest(path: Union[str, None]) -> Union[str, None]:
+    """
+    A digest of the contents of a file that a recorded game was built from, e.g. its scenario, so that playback can
+    tell if the file has changed since
+
+    :param path: the file, or None
+    :return: SHA-256 of the file in hex, or None if path is None
+    """
+
+    if path is None:
+        return None
+
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def pack_input(state: InputState) -> bytes:
+    """
+    Encode an InputState. Only the keys in CONTROL_KEYS are kept, since they are the only ones the game reads.
+
+    :param state: the input of a tick
+    :return: the encoded input
+    """
+
+    keys = 0
+    for i, key in enumerate(CONTROL_KEYS):
+        if key in state.keys:
+            keys |= 1 << i
+
+    flags = 0
+    for i, pressed in enumerate(state.mouse_buttons + (state.quit,)):
+        if pressed:
+            flags |= 1 << i
+
+    return INPUT.pack(keys, state.mouse_pos[0], state.mouse_pos[1], flags)
+
+
+def unpack_input(data: bytes) -> InputState:
+    """
+    Decode an InputState encoded by pack_input
+
+    :param data: the encoded input
+    :return: InputState
+    """
+
+    keys, x, y, flags = INPUT.unpack(data)
+
+    return InputState(frozenset(key for i, key in enumerate(CONTROL_KEYS) if keys & (1 << i)),
+                      (x, y),
+                      tuple(bool(flags & (1 << i)) for i in range(3)),
+                      bool(flags & (1 << 3)))
+
+
+def body_state(body: pymunk.Body) -> tuple:
+    """
+    Everything about a body that the simulation changes
+
+    :param body: the body
+    :return: state made of plain data
+    """
+
+    return (tuple(body.position), tuple(body.velocity), body.angle, body.angular_velocity,
+            tuple(body.force), body.torque)
+
+
+def set_body_state(body: pymunk.Body, state: tuple) -> None:
+    """
+    Restore a body to a state from body_state
+
+    :param body: the body
+    :param state: the state
+    :return: None
+    """
+
+    position, velocity, angle, angular_velocity, force, torque = state
+
+    # the position is of the centre of gravity rotated by the angle, so the angle has to be set first
+    body.angle = angle
+    body.position = position
+    body.velocity = velocity
+    body.angular_velocity = angular_velocity
+    body.force = force
+    body.torque = torque
+
+
+def eid_of(ent: Union[GenericEntity, None]) -> Union[int, None]:
+    """
+    The id of an entity that may be None
+
+    :param ent: the entity
+    :return: its id
+    """
+
+    return None if ent is None else ent.eid
+
+
+def entity_state(ent: GenericEntity) -> Union[dict, None]:
+    """
+    Capture the state of an entity
+
+    :param ent: the entity
+    :return: state made of plain data, or None for entities that are rebuilt from others (health bars and lasers)
+    """
+
+    if isinstance(ent, (HealthBar, Laser, LaserContact)):
+        return None
+
+    state = {"pos": tuple(ent.pos), "a_pos": ent.a_pos}
+
+    if hasattr(ent, "body"):
+        state["body"] = body_state(ent.body)
+    if isinstance(ent, HealthEntity):
+        state["hp"] = ent.hp
+
+    if isinstance(ent, Car2):
+        state["steering_angle"] = ent.steering_angle
+        if ent.wep is not None:
+            state["wep"] = weapon_state(ent.wep)
+    elif isinstance(ent, Target):
+        # enemies streamed in with a chunk may have to be recreated
+        state["kind"] = type(ent).__name__
+        state["max_hp"] = ent.max_hp
+        state["image"] = ASSETS.key_of(ent.sprite.original_image)
+        state["hp_bar"] = ent.hp_bar.eid
+        if isinstance(ent, MovingTarget):
+            state["points"] = (tuple(ent.p_a), tuple(ent.p_b))
+            state["dest"] = tuple(ent.dest)
+    elif isinstance(ent, Projectile):
+        state["kind"] = type(ent).__name__
+        state["damage"] = ent.damage
+        state["image"] = ASSETS.key_of(ent.sprite.original_image)
+        # the hitbox depends on where the projectile was fired from, not where it is now
+        state["vertices"] = [tuple(v) for v in ent.shape.get_vertices()]
+        if isinstance(ent, Rocket):
+            state["target"] = eid_of(ent.target)
+            state["target_pos"] = None if ent.target is None else tuple(ent.target.pos)
+            state["tracking"] = ent.tracking
+            state["explosion"] = (ent.explosion_radius, ent.explosion_force)
+    elif isinstance(ent, Explosion):
+        state["kind"] = "Explosion"
+        state["radius"] = ent.sprite.image.get_width() / 2
+        state["lifespan"] = ent.lifespan
+    elif isinstance(ent, Reticle):
+        state["kind"] = "Reticle"
+        state["target"] = eid_of(ent.current_target)
+
+    return state
+
+
+def weapon_state(wep: Weapon) -> dict:
+    """
+    Capture the state of a weapon
+
+    :param wep: the weapon
+    :return: state made of plain data
+    """
+
+    state = {"pos": tuple(wep.pos), "a_pos": wep.a_pos, "curr_atk_cd": wep.curr_atk_cd, "ammo": wep.ammo}
+
+    if isinstance(wep, LaserCannon) and wep.laser is not None:
+        state["laser"] = (wep.laser.eid, wep.laser_contact.eid, wep.laser.length, tuple(wep.laser_contact.pos))
+
+    if isinstance(wep, RocketLauncher):
+        state["current_target"] = eid_of(wep.current_target)
+        state["potential_target"] = eid_of(wep.potential_target)
+        state["targeting_status"] = wep.targeting_status
+
+    return state
+
+
+def capture_state(game: 'Game') -> dict:
+    """
+    Capture everything needed to continue a game from the start of its current tick. The state is only made of
+    dicts, lists, tuples, numbers, strings and NumPy arrays, which encode_state turns into JSON.
+
+    :param game: the game
+    :return: state made of plain data
+    """
+
+    bullets = None
+    if game.bullets is not None:
+        n = game.bullets.count
+        bullets = (game.bullets.pos[:n].copy(), game.bullets.vel[:n].copy(),
+                   game.bullets.damage[:n].copy(), game.bullets.life[:n].copy())
+
+    return {
+        "tick": game.tick_count,
+        "next_id": game.entities.next_id,
+        "order": list(game.entities.entities),
+        "entities": {ent.eid: entity_state(ent) for ent in game.entities},
+        "last_keys": tuple(game.last_keys),
+        "min_extent": game.min_extent,
+        "bullets": bullets,
+        # the reticle is kept by the game while it isn't shown, and shown again with the same id
+        "reticle": None if game.reticle is None else (game.reticle.eid, eid_of(game.reticle.current_target)),
+        "chunks_spawned": None if game.chunks is None else sorted(game.chunks.spawned),
+    }
+
+
+def encode_state(state: dict) -> bytes:
+    """
+    Encode a state from capture_state as JSON
+
+    :param state: the state
+    :return: the encoded state
+    """
+
+    state = dict(state)
+    # JSON objects only have string keys, so entities go in as [eid, state] pairs
+    state["entities"] = list(state["entities"].items())
+    if state["bullets"] is not None:
+        state["bullets"] = [arr.tolist() for arr in state["bullets"]]
+
+    return json.dumps(state, separators=(",", ":")).encode()
+
+
+def decode_state(data: bytes) -> dict:
+    """
+    Decode a state encoded by encode_state. Tuples come back as lists and arrays as lists of numbers, which
+    restore_state takes just the same.
+
+    :param data: the encoded state
+    :return: state for restore_state
+    """
+
+    state = json.loads(data)
+    state["entities"] = {eid: ent_state for eid, ent_state in state["entities"]}
+
+    return state
+
+
+def restore_state(game: 'Game', state: dict) -> None:
+    """
+    Put a game into a state from capture_state. The game has to have been set up the same way as the one the state
+    was captured from, at the same or an earlier tick: entities that have died since are removed and projectiles,
+    explosions, reticles and enemies streamed in with a chunk are recreated, but cars and the other enemies can't be
+    brought back.
+
+    The space is rebuilt, so the game goes on exactly like one that was played up to the state, as long as that game
+    rebuilt its space there too, which recorded and replayed games do at every keyframe.
+
+    :param game: the game
+    :param state: the state
+    :return: None
+    """
+
+    saved = state["entities"]
+    # entities that are removed still have to be found, e.g. a dead enemy that a rocket is still flying towards
+    known = dict(game.entities.entities)
+
+    # drop whatever doesn't exist in the saved state, and the laser, which the next tick rebuilds
+    wep = game.car.wep if game.car is not None else None
+    if isinstance(wep, LaserCannon) and wep.laser is not None:
+        game.delete_entity(wep.laser)
+        game.delete_entity(wep.laser_contact)
+        wep.laser = None
+
+    for ent in list(game.entities):
+        if ent.eid not in saved and not isinstance(ent, HealthBar):
+            game.destroy(ent)
+    game.flush_destroyed()
+
+    # the laser is fired again from the restored weapon
+    wep_state = saved.get(eid_of(game.car), {}).get("wep", {}) if game.car is not None else {}
+    if "laser" in wep_state:
+        laser_eid, contact_eid, length, contact_pos = wep_state["laser"]
+        wep.pos = pymunk.Vec2d(*wep_state["pos"])
+        wep.a_pos = wep_state["a_pos"]
+        wep.shoot()
+        wep.laser.eid = laser_eid
+        wep.laser.length = length
+        wep.laser_contact.eid = contact_eid
+        wep.laser_contact.pos = pymunk.Vec2d(*contact_pos)
+        game.add_entity(wep.laser)
+        game.add_entity(wep.laser_contact)
+
+    if state["reticle"] is not None:
+        eid, target = state["reticle"]
+        if game.reticle is None:
+            game.reticle = game.make_reticle(known[target])
+        game.reticle.eid = eid
+        game.reticle.current_target = known.get(target)
+        known[eid] = game.reticle
+
+    # bring back what exists in the saved state but not in the game
+    for eid, ent_state in saved.items():
+        if ent_state is None or game.entities.get(eid) is not None:
+            continue
+
+        if ent_state.get("kind") == "Reticle":
+            game.add_entity(game.reticle)
+            continue
+
+        ent = recreate_entity(ent_state)
+        ent.eid = eid
+        known[eid] = ent
+
+        if isinstance(ent, Projectile):
+            game.add_proj(ent)
+        elif isinstance(ent, Target):
+            ent.hp_bar.eid = ent_state["hp_bar"]
+            game.add_target(ent)
+        else:
+            game.add_entity(ent, "explosions")
+
+    for eid, ent_state in saved.items():
+        if ent_state is not None:
+            set_entity_state(game.entities.get(eid), ent_state, known)
+
+            # a rocket's target that has died since stays where it died
+            target = ent_state.get("target")
+            if ent_state.get("kind") == "Rocket" and target is not None and target not in saved:
+                known[target].pos = pymunk.Vec2d(*ent_state["target_pos"])
+
+    game.entities.reorder(state["order"])
+    game.entities.next_id = state["next_id"]
+    game.tick_count = state["tick"]
+    game.last_keys = frozenset(state["last_keys"])
+    game.min_extent = state["min_extent"]
+
+    if state["chunks_spawned"] is not None:
+        # chunks keep whatever they spawned only once, even if the game was behind the saved state
+        game.chunks.spawned = set(map(tuple, state["chunks_spawned"]))
+
+    if state["bullets"] is not None:
+        game.bullets.clear()
+        for pos, vel, damage, life in zip(*state["bullets"]):
+            game.bullets.spawn(pos, vel, damage, life)
+
+    game.rebuild_space()
+
+    # start interpolating from the restored state
+    for ent in game.entities:
+        ent.save_transform()
+    game.full_redraw = True
+
+
+def recreate_entity(state: dict) -> GenericEntity:
+    """
+    Create a projectile, explosion or enemy from its saved state, without adding it to a game
+
+    :param state: state from entity_state
+    :return: the entity
+    """
+
+    kind = state.get("kind")
+    pos = pymunk.Vec2d(*state["pos"])
+
+    if kind == "Bullet":
+        return Bullet(state["damage"], pos, 0, state["a_pos"], ASSETS.load(state["image"]))
+    elif kind == "Rocket":
+        radius, force = state["explosion"]
+        return Rocket(state["damage"], radius, force, pos, 0, state["a_pos"], ASSETS.load(state["image"]), None,
+                      state["tracking"])
+    elif kind == "Explosion":
+        return Explosion(state["radius"], pos)
+    elif kind == "Target":
+        return Target(pos, state["max_hp"], ASSETS.load(state["image"]))
+    elif kind == "MovingTarget":
+        p_a, p_b = state["points"]
+        return MovingTarget(pymunk.Vec2d(*p_a), pymunk.Vec2d(*p_b), state["max_hp"], ASSETS.load(state["image"]))
+
+    raise ValueError(f"can't recreate a missing {kind or 'entity'}; the game wasn't set up like the recorded one")
+
+
+def set_entity_state(ent: GenericEntity, state: dict, known: dict[int, GenericEntity]) -> None:
+    """
+    Restore an entity to its saved state
+
+    :param ent: the entity
+    :param state: state from entity_state
+    :param known: every entity seen, by id, to resolve references to other entities
+    :return: None
+    """
+
+    ent.pos = pymunk.Vec2d(*state["pos"])
+    ent.a_pos = state["a_pos"]
+
+    if "body" in state:
+        set_body_state(ent.body, state["body"])
+    if "hp" in state:
+        ent.hp = state["hp"]
+
+    if isinstance(ent, Car2):
+        ent.steering_angle = state["steering_angle"]
+        ent.update_grooves()
+        if "wep" in state:
+            set_weapon_state(ent.wep, state["wep"], known)
+    elif isinstance(ent, MovingTarget):
+        ent.dest = pymunk.Vec2d(*state["dest"])
+    elif isinstance(ent, Projectile):
+        ent.shape.unsafe_set_vertices(state["vertices"])
+        if isinstance(ent, Rocket):
+            ent.target = known.get(state["target"])
+    elif isinstance(ent, Explosion):
+        ent.lifespan = state["lifespan"]
+
+
+def set_weapon_state(wep: Weapon, state: dict, known: dict[int, GenericEntity]) -> None:
+    """
+    Restore a weapon to its saved state
+
+    :param wep: the weapon
+    :param state: state from weapon_state
+    :param known: every entity seen, by id, to resolve the weapon's targets
+    :return: None
+    """
+
+    wep.pos = pymunk.Vec2d(*state["pos"])
+    wep.a_pos = state["a_pos"]
+    wep.curr_atk_cd = state["curr_atk_cd"]
+    wep.ammo = state["ammo"]
+
+    if isinstance(wep, RocketLauncher):
+        wep.current_target = known.get(state["current_target"])
+        wep.potential_target = known.get(state["potential_target"])
+        wep.targeting_status = state["targeting_status"]
+
+
+class ReplayWriter:
+    """
+    Records the input of every tick of a game into a replay file, with a keyframe of the whole game state every
+    keyframe_interval ticks so that playback can start from the middle
+    """
+
+    file: BinaryIO
+    keyframe_interval: int      # ticks between keyframes
+
+    def __init__(self, path: str, tickrate: int = TICKRATE, keyframe_seconds: float = REPLAY_KEYFRAME_SECONDS,
+                 setup: Union[dict, None] = None) -> None:
+        """
+        Initializer
+
+        :param path: where to write the replay
+        :param tickrate: tick rate of the recorded game, which playback has to use too
+        :param keyframe_seconds: seconds of game time between keyframes
+        :param setup: how the recorded game was built, e.g. its scenario and level, as plain data; playback has to
+            build its game the same way
+        """
+
+        self.file = open(path, "wb")
+        self.keyframe_interval = max(1, round(keyframe_seconds * tickrate))
+        setup = json.dumps(setup or {}).encode()
+        self.file.write(HEADER.pack(MAGIC, REPLAY_VERSION, tickrate, self.keyframe_interval, len(setup)) + setup)
+
+    def begin_tick(self, game: 'Game') -> None:
+        """
+        Called by the game at the start of every tick, before its input is polled
+
+        :param game: the recorded game
+        :return: None
+        """
+
+        if game.tick_count % self.keyframe_interval == 0:
+            data = encode_state(capture_state(game))
+            self.file.write(TAG_KEYFRAME + KEYFRAME.pack(game.tick_count, len(data)) + data)
+            # seeking to this keyframe starts from a new space, so the recorded game has to as well
+            game.rebuild_space()
+
+    def record(self, state: InputState) -> None:
+        """
+        Called by the game with the input it polled this tick
+
+        :param state: the input
+        :return: None
+        """
+
+        self.file.write(TAG_INPUT + pack_input(state))
+
+    def close(self) -> None:
+        """
+        Finish writing the replay
+
+        :return: None
+        """
+
+        self.file.close()
+
+
+class ReplayReader:
+    """
+    A replay file read back into memory. Keyframes are only decoded when they are asked for.
+    """
+
+    tickrate: int
+    keyframe_interval: int
+    setup: dict                         # how the recorded game was built
+    inputs: list[InputState]            # the input of every tick, in order
+    keyframes: dict[int, bytes]         # encoded state by tick
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializer
+
+        :param path: the replay file
+        """
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, self.tickrate, self.keyframe_interval, setup_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} isn't a version {REPLAY_VERSION} replay")
+
+        self.setup = json.loads(data[HEADER.size:HEADER.size + setup_size])
+        self.inputs = []
+        self.keyframes = {}
+
+        offset = HEADER.size + setup_size
+        while offset < len(data):
+            tag = data[offset:offset + 1]
+            offset += 1
+
+            if tag == TAG_INPUT:
+                self.inputs.append(unpack_input(data[offset:offset + INPUT.size]))
+                offset += INPUT.size
+            elif tag == TAG_KEYFRAME:
+                tick, size = KEYFRAME.unpack_from(data, offset)
+                offset += KEYFRAME.size
+                self.keyframes[tick] = data[offset:offset + size]
+                offset += size
+            else:
+                raise ValueError(f"corrupt replay {path} at byte {offset - 1}")
+
+    def setup_mismatches(self, setup: dict) -> list[str]:
+        """
+        Compare how a game is about to be built with how the recorded game was, since playing the replay back in a
+        game built differently silently goes its own way
+
+        :param setup: how the game is about to be built, as given to ReplayWriter
+        :return: the keys of setup whose values differ from the recorded ones
+        """
+
+        return [key for key, value in setup.items() if self.setup.get(key) != value]
+
+    def keyframe(self, tick: int) -> dict:
+        """
+        Get a keyframe
+
+        :param tick: the tick the keyframe was captured at
+        :return: state for restore_state
+        """
+
+        return decode_state(self.keyframes[tick])
+
+    def keyframe_before(self, tick: int) -> Union[int, None]:
+        """
+        Find the last keyframe at or before a tick
+
+        :param tick: the tick
+        :return: the tick of the keyframe, or None if there is none
+        """
+
+        return max((k for k in self.keyframes if k <= tick), default=None)
+
+
+class ReplayInput(ScriptedInput):
+    """
+    Input played back from a replay. The game is told to quit once the recording runs out.
+    """
+
+    keyframes: set[int]     # ticks at which the recorded game rebuilt its space
+    replaying = True
+
+    def __init__(self, reader: ReplayReader) -> None:
+        """
+        Initializer
+
+        :param reader: the replay to play back
+        """
+
+        ScriptedInput.__init__(self, reader.inputs)
+        self.keyframes = set(reader.keyframes)
+
+    def begin_tick(self, game: 'Game') -> None:
+        """
+        Rebuild the space wherever the recorded game did, so the game steps exactly like it
+
+        :param game: the game
+        :return: None
+        """
+
+        if game.tick_count in self.keyframes:
+            game.rebuild_space()
+
+
+def seek(game: 'Game', reader: ReplayReader, tick: int) -> None:
+    """
+    Advance a game that is playing back reader with a ReplayInput to tick, starting from the last keyframe before it
+    instead of simulating every tick from the start
+
+    :param game: a game set up the same way as the recorded one, no further than tick
+    :param reader: the replay the game is playing
+    :param tick: the tick to go to
+    :return: None
+    """
+
+    keyframe = reader.keyframe_before(tick)
+    if keyframe is not None and keyframe > game.tick_count:
+        restore_state(game, reader.keyframe(keyframe))
+        game.input_source.tick = keyframe
+
+    while game.tick_count < tick and not game.done:
+        game.tick()
+
+
+def check_seek(make_game: Callable[[], 'Game'], reader: ReplayReader, tick: int, after: int = 1) -> bool:
+    """
+    Check that seeking to a tick gives exactly the game that playing the replay up to it does
+
+    :param make_game: creates a game set up the same way as the recorded one, playing back reader with a ReplayInput
+    :param reader: the replay
+    :param tick: the tick to seek to
+    :param after: ticks both games are played on for before comparing them, so that what the physics solver carries
+        from one step to the next is compared too
+    :return: true iff both games end up in the same state
+    """
+
+    played = make_game()
+    while played.tick_count < tick + after and not played.done:
+        played.tick()
+
+    seeked = make_game()
+    seek(seeked, reader, tick)
+    while seeked.tick_count < tick + after and not seeked.done:
+        seeked.tick()
+
+    return encode_state(capture_state(played)) == encode_state(capture_state(seeked))
@@ -0,0 +1,73 @@
+import pygame
+from collections import OrderedDict
+
+from constants import *
+
+
+class RotationCache:
+    """
+    Memoizes pygame.transform.rotate for shared source surfaces. Angles are snapped to a fixed resolution so that
+    sprites at (nearly) the same heading share one rotated Surface, and the least recently used rotations are
+    evicted once the cache is full.
+    """
+
+    resolution: float                                       # angular resolution in degrees
+    max_entries: int                                        # number of rotated surfaces kept
+    entries: OrderedDict[tuple[pygame.Surface, int], pygame.Surface]
+    hits: int
+    misses: int
+
+    def __init__(self, resolution: float = ROTATION_RESOLUTION, max_entries: int = ROTATION_CACHE_SIZE) -> None:
+        """
+        Initializer
+
+        :param resolution: angles are rounded to a multiple of this many degrees
+        :param max_entries: maximum number of rotated surfaces to keep
+        """
+
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def rotate(self, surface: pygame.Surface, angle: float) -> pygame.Surface:
+        """
+        Rotate surface counterclockwise by angle degrees, like pygame.transform.rotate. The result is shared and
+        must not be drawn on.
+
+        :param surface: source surface, which must not be modified after it has been rotated
+        :param angle: angle in degrees
+        :return: the rotated Surface
+        """
+
+        steps = round(angle / self.resolution) % round(360 / self.resolution)
+        key = (surface, steps)
+
+        rotated = self.entries.get(key)
+        if rotated is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return rotated
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, steps * self.resolution)
+        self.entries[key] = rotated
+
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        return rotated
+
+    def clear(self) -> None:
+        """
+        Forget every cached rotation
+
+        :return: None
+        """
+
+        self.entries.clear()
+
+
+# the cache shared by every sprite
+ROTATIONS = RotationCache()
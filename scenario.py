@@ -0,0 +1,294 @@
+import json
+import pygame
+import pymunk
+from typing import Union
+
+from constants import *
+from game import Game
+from car_2 import Car2
+from enemy import Target, MovingTarget
+from weapon import Weapon, MachineGun, RocketLauncher, LaserCannon
+from level import Level, load_level
+from chunks import ChunkSource
+from asset_cache import ASSETS
+
+
+# the weapon types a scenario can use, and the stats each takes on top of damage, atk_cd, ammo and offset
+WEAPON_TYPES = {
+    "machine_gun": (),
+    "rocket_launcher": ("pool_size", "explosion_radius", "explosion_force"),
+    "laser_cannon": (),
+}
+
+# the weapons of DEFAULT_SCENARIO, each named after its type
+WEAPONS = tuple(WEAPON_TYPES)
+
+
+class Scenario:
+    """
+    Everything a game starts with, described by a JSON file:
+
+        {"level": "path/to/level.json", "stream": false,
+         "assets": {"car": {"image": "assets/car1.png", "size": [45, 80]},
+                    "target": {"solid": [50, 50], "colour": [255, 0, 0]}, ...},
+         "weapons": {"gun": {"type": "machine_gun", "damage": 20, "atk_cd": 10, "ammo": 500, "offset": [-4, 15],
+                             "image": "gun"}, ...},
+         "defaults": {"car": {...}, "target": {...}},
+         "cars": [{"pos": [x, y], "mass": 1000, "hp": 250, "image": "car", "weapon": "gun", "ai": false}, ...],
+         "targets": [{"pos": [x, y], "hp": 1500, "image": "target"}, {"path": [[x, y], [x, y]], ...}, ...]}
+
+    Cars and targets take any fields they leave out from "defaults", which keeps large scenarios short. A target
+    with a path is a MovingTarget between its two points. The first car that isn't an AI is the player's.
+
+    Assets and weapons are only declared by name: an asset is loaded the first time something in the scenario uses
+    it, so declaring assets that go unused costs nothing. Paths are relative to the working directory, like those of
+    the assets in main.py.
+    """
+
+    data: dict
+
+    def __init__(self, data: dict) -> None:
+        """
+        Initializer
+
+        :param data: the parsed scenario
+        """
+
+        self.data = data
+
+    def with_defaults(self, kind: str, spec: dict) -> dict:
+        """
+        Fill in the fields an entry leaves out from "defaults"
+
+        :param kind: "car" or "target"
+        :param spec: the entry
+        :return: the complete entry
+        """
+
+        return {**self.data.get("defaults", {}).get(kind, {}), **spec}
+
+    def asset(self, name: str) -> pygame.Surface:
+        """
+        Get one of the scenario's assets, loading it if this is the first time it is used
+
+        :param name: name of the asset in "assets"
+        :return: the shared Surface
+        """
+
+        spec = self.data.get("assets", {}).get(name)
+        if spec is None:
+            raise ValueError(f"unknown asset {name}")
+
+        if "image" in spec:
+            return ASSETS.image(spec["image"], spec.get("size"))
+        elif "solid" in spec:
+            return ASSETS.solid(tuple(spec["solid"]), tuple(spec["colour"]))
+        elif "circle" in spec:
+            return ASSETS.circle(spec["circle"], tuple(spec["colour"]))
+
+        raise ValueError(f"asset {name} is neither an image, a solid nor a circle")
+
+    def weapon_stats(self, name: str) -> dict:
+        """
+        Get the stats of one of the scenario's weapons that make_weapon can override: damage, atk_cd and those of
+        its type
+
+        :param name: name of the weapon in "weapons"
+        :return: the stats the scenario gives the weapon
+        """
+
+        spec = self.data.get("weapons", {}).get(name)
+        if spec is None:
+            raise ValueError(f"unknown weapon {name}")
+
+        kind = spec["type"]
+        if kind not in WEAPON_TYPES:
+            raise ValueError(f"weapon {name} has unknown type {kind}")
+
+        return {key: spec[key] for key in ("damage", "atk_cd") + WEAPON_TYPES[kind] if key in spec}
+
+    def make_weapon(self, name: str, pos: pymunk.Vec2d, **stats) -> Weapon:
+        """
+        Create one of the scenario's weapons
+
+        :param name: name of the weapon in "weapons"
+        :param pos: position of the weapon
+        :param stats: overrides of the stats the scenario gives the weapon, any of those in weapon_stats
+        :return: the weapon
+        """
+
+        unknown = set(stats) - set(self.weapon_stats(name))
+        if unknown:
+            raise ValueError(f"{name} has no stats {sorted(unknown)}")
+
+        spec = {**self.data["weapons"][name], **stats}
+        kind = spec["type"]
+
+        extra = {key: spec[key] for key in WEAPON_TYPES[kind] if key in spec}
+        args = (pos, spec["damage"], spec["atk_cd"])
+        rest = (spec.get("ammo", 500), pymunk.Vec2d(*spec.get("offset", (0, 0))), self.asset(spec["image"]))
+
+        if kind == "machine_gun":
+            return MachineGun(*args, *rest, **extra)
+        elif kind == "rocket_launcher":
+            return RocketLauncher(*args, *rest, **extra)
+        else:
+            return LaserCannon(*args, None, *rest)
+
+    def make_car(self, spec: dict, space: pymunk.Space) -> Car2:
+        """
+        Create a car, with its weapon if it has one
+
+        :param spec: the car's entry in "cars"
+        :param space: space the car adds its body to
+        :return: the car
+        """
+
+        spec = self.with_defaults("car", spec)
+        pos = pymunk.Vec2d(*spec["pos"])
+
+        car = Car2(space, spec.get("mass", 1000), pos, spec.get("hp", 250), self.asset(spec["image"]))
+        if spec.get("weapon") is not None:
+            car.set_weapon(self.make_weapon(spec["weapon"], pos))
+
+        return car
+
+    def make_target(self, spec: dict) -> Target:
+        """
+        Create a Target, or a MovingTarget if it has a path
+
+        :param spec: the target's entry in "targets"
+        :return: the target
+        """
+
+        spec = self.with_defaults("target", spec)
+        image = self.asset(spec["image"])
+
+        if "path" in spec:
+            p_a, p_b = spec["path"]
+            return MovingTarget(pymunk.Vec2d(*p_a), pymunk.Vec2d(*p_b), spec.get("hp", 1500), image)
+
+        return Target(pymunk.Vec2d(*spec["pos"]), spec.get("hp", 1500), image)
+
+    def level(self) -> Union[Level, None]:
+        """
+        Load the scenario's level
+
+        :return: the Level, or None if the scenario doesn't have one
+        """
+
+        if self.data.get("level") is None:
+            return None
+
+        return load_level(self.data["level"])
+
+    def build(self, width: int = MAP_WIDTH, height: int = MAP_HEIGHT, level: Union[Level, None] = None,
+              chunk_source: Union[ChunkSource, None] = None, **game_args) -> Game:
+        """
+        Create a Game with everything in the scenario in it
+
+        :param width: width of the window
+        :param height: height of the window
+        :param level: level to use instead of the scenario's
+        :param chunk_source: chunks to stream the world from instead of the scenario's level
+        :param game_args: any other arguments of Game
+        :return: the game
+        """
+
+        if level is None and chunk_source is None:
+            level = self.level()
+            if level is not None and self.data.get("stream", False):
+                chunk_source, level = level, None
+
+        game = Game(width, height, level=level, chunk_source=chunk_source, **game_args)
+
+        for spec in self.data.get("cars", []):
+            car = self.make_car(spec, game.space)
+            ai = self.with_defaults("car", spec).get("ai", False)
+            if not ai and game.car is None:
+                game.set_car(car)
+            else:
+                game.add_car(car, ai=ai)
+
+        game.add_targets([self.make_target(spec) for spec in self.data.get("targets", [])])
+
+        return game
+
+
+def load_scenario(path: str) -> Scenario:
+    """
+    Read a scenario file
+
+    :param path: path of the JSON file
+    :return: the Scenario
+    """
+
+    with open(path) as f:
+        data = json.load(f)
+
+    return Scenario(data)
+
+
+def weapon_stats(name: str) -> dict:
+    """
+    Get the stats DEFAULT_SCENARIO gives one of its weapons, which make_weapon can override
+
+    :param name: one of WEAPONS
+    :return: the stats
+    """
+
+    return load_scenario(DEFAULT_SCENARIO).weapon_stats(name)
+
+
+def make_weapon(name: str, pos: pymunk.Vec2d, **stats) -> Weapon:
+    """
+    Create one of the weapons of DEFAULT_SCENARIO
+
+    :param name: one of WEAPONS
+    :param pos: position of the weapon
+    :param stats: overrides of the weapon's weapon_stats
+    :return: the weapon
+    """
+
+    return load_scenario(DEFAULT_SCENARIO).make_weapon(name, pos, **stats)
+
+
+def make_car(space: pymunk.Space, pos: pymunk.Vec2d, weapon: Union[str, None] = None, **stats) -> Car2:
+    """
+    Create a car like the one in DEFAULT_SCENARIO
+
+    :param space: space the car adds its body to
+    :param pos: position of the car
+    :param weapon: one of WEAPONS to give the car, or None for none
+    :param stats: overrides of the weapon's weapon_stats
+    :return: the car
+    """
+
+    scenario = load_scenario(DEFAULT_SCENARIO)
+    car = Car2(space, 1000, pos, 250, scenario.asset("car"))
+    if weapon is not None:
+        car.set_weapon(scenario.make_weapon(weapon, pos, **stats))
+
+    return car
+
+
+def target_image() -> pygame.Surface:
+    """
+    The image of the targets in DEFAULT_SCENARIO
+
+    :return: the shared Surface
+    """
+
+    return load_scenario(DEFAULT_SCENARIO).asset("target")
+
+
+def make_headless_game(**game_args) -> Game:
+    """
+    Create an empty headless game whose world is the size of the window, as the benchmark, the training environment
+    and the sweeps play in
+
+    :param game_args: any other arguments of Game
+    :return: the game
+    """
+
+    return Game(MAP_WIDTH, MAP_HEIGHT, headless=True, world_width=MAP_WIDTH, world_height=MAP_HEIGHT, **game_args)
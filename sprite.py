@@ -21,7 +21,9 @@ class Sprite(pygame.sprite.Sprite):
         self.image = image
 
         # make the space created from rotation transparent
-        self.image = self.image.convert_alpha()
+        #   images that already have per pixel alpha (e.g. from the AssetCache) are shared, so don't copy them
+        if not self.image.get_flags() & pygame.SRCALPHA:
+            self.image = self.image.convert_alpha()
 
         # set the position of the center of the image to pos[]
         self.rect = self.image.get_rect(center=self.image.get_rect(center=pos).center)
@@ -2,12 +2,18 @@ import math
 import pygame
 import pygame.mouse
 import pymunk
-from typing import Union
+from typing import Union, TYPE_CHECKING
 
 from constants import *
 from projectiles import Projectile, Bullet, Rocket, Laser
 from entities import GenericEntity, HealthEntity, LaserContact
 from sprite import Sprite
+from asset_cache import ASSETS
+from rotation_cache import ROTATIONS
+from pool import ProjectilePool
+
+if TYPE_CHECKING:
+    from bullet_system import BulletSystem
 
 
 class Weapon(GenericEntity):
@@ -23,9 +29,11 @@ class Weapon(GenericEntity):
     a_pos: float            # direction the weapon is facing
     barrel_len: int         # barrel length
     rot_off: pymunk.Vec2d   # offset for the pivot of rotation for the sprite
+    proj_type = None        # the pooled Projectile subclass fired by the weapon, if any
+    pool: Union[ProjectilePool, None]
 
     def __init__(self, pos: pymunk.Vec2d, damage: float, atk_cd: int, ammo: float,
-                 rot_off: pymunk.Vec2d, image: pygame.image):
+                 rot_off: pymunk.Vec2d, image: pygame.image, pool_size: int = PROJECTILE_POOL_SIZE):
         """
         Initializer
 
@@ -34,6 +42,7 @@ class Weapon(GenericEntity):
         :param atk_cd: the number of ticks a weapon requires inbetween firing projectiles
         :param ammo: the number of projectiles a weapon can fire before running out
         :param image: the image for the sprite of the weapon
+        :param pool_size: high-water mark of the weapon's projectile pool
         """
 
         GenericEntity.__init__(self, Sprite(pos, image), pos, math.pi)
@@ -44,17 +53,20 @@ class Weapon(GenericEntity):
         self.ammo = ammo
         self.rot_off = rot_off
         self.barrel_len = self.sprite.rect.h
+        self.pool = ProjectilePool(self.proj_type, pool_size) if self.proj_type is not None else None
 
-    def update_sprite(self) -> None:
+    def update_sprite(self, alpha: float = 1.0) -> None:
         """
         Update the sprite
 
+        :param alpha: how far between the previous and current tick to draw the weapon
         :return: None
         """
 
-        self.sprite.image = pygame.transform.rotate(self.sprite.original_image, ((180 / math.pi) * self.a_pos))
-        offset_rotated = self.rot_off.rotated(-self.a_pos)
-        self.sprite.rect = self.sprite.image.get_rect(center=self.pos + offset_rotated)
+        pos, a_pos = self.lerp_transform(alpha)
+        self.sprite.image = ROTATIONS.rotate(self.sprite.original_image, ((180 / math.pi) * a_pos))
+        offset_rotated = self.rot_off.rotated(-a_pos)
+        self.sprite.rect = self.sprite.image.get_rect(center=pos + offset_rotated)
 
     def update(self) -> None:
         """
@@ -63,7 +75,16 @@ class Weapon(GenericEntity):
         """
 
         self.curr_atk_cd -= 1
-        self.update_sprite()
+
+    def muzzle_pos(self, proj_length: float) -> pymunk.Vec2d:
+        """
+        Where the centre of a newly fired projectile goes
+
+        :param proj_length: length of the projectile
+        :return: position of the projectile
+        """
+
+        return self.pos + (pymunk.Vec2d(0, self.barrel_len / 2 + self.rot_off.y + proj_length / 2)).rotated(-self.a_pos)
 
     def shoot(self) -> Projectile:
         """
@@ -79,6 +100,10 @@ class MachineGun(Weapon):
     A machine gun that shoots bullets
     """
 
+    proj_type = Bullet
+    bullet_size = (2, 80)
+    bullet_speed = 2500
+
     def shoot(self) -> Union[Bullet, None]:
         """
         Shoots a bullet in the guns current direction
@@ -87,14 +112,30 @@ class MachineGun(Weapon):
         if self.curr_atk_cd <= 0:
             self.curr_atk_cd = self.atk_cd
 
-            bullet_image = pygame.surface.Surface((2, 80))
-            bullet_image.fill(RED)
+            bullet_image = ASSETS.solid(self.bullet_size, RED)
+
+            return self.pool.acquire(self.damage,
+                                     self.muzzle_pos(bullet_image.get_height()),
+                                     self.bullet_speed,
+                                     self.a_pos,
+                                     bullet_image)
+
+    def shoot_into(self, bullets: 'BulletSystem') -> bool:
+        """
+        Shoots a bullet in the guns current direction into a vectorized BulletSystem instead of as a Bullet
+
+        :param bullets: the BulletSystem to add the bullet to
+        :return: true iff a bullet was fired
+        """
+        if self.curr_atk_cd <= 0:
+            self.curr_atk_cd = self.atk_cd
+
+            bullets.spawn(self.muzzle_pos(self.bullet_size[1]),
+                          pymunk.Vec2d(0, self.bullet_speed).rotated(-self.a_pos),
+                          self.damage)
+            return True
 
-            return Bullet(self.damage,
-                          self.pos + (pymunk.Vec2d(0, self.barrel_len / 2 + self.rot_off.y + bullet_image.get_height() / 2)).rotated(-self.a_pos),
-                          2500,
-                          self.a_pos,
-                          bullet_image)
+        return False
 
 
 class RocketLauncher(Weapon):
@@ -105,11 +146,30 @@ class RocketLauncher(Weapon):
     potential_target: Union[HealthEntity, None]     # the potential target being considered by the select_target function
     targeting_status: int                           # an integer from 0-100, 100 signifying that the target is locked on
     current_target: Union[HealthEntity, None]       # the current target locked onto by the launcher
+    explosion_radius: float                         # radius of the explosion of each rocket
+    explosion_force: float                          # impulse an explosion applies to the enemies it hits
+    proj_type = Rocket
 
     def __init__(self, pos: pymunk.Vec2d, damage: float, atk_cd: int, ammo: float,
-                 rot_off: pymunk.Vec2d, image: pygame.image):
-        Weapon.__init__(self, pos, damage, atk_cd, ammo, rot_off, image)
+                 rot_off: pymunk.Vec2d, image: pygame.image, pool_size: int = PROJECTILE_POOL_SIZE,
+                 explosion_radius: float = 100, explosion_force: float = 25000):
+        """
+        Initializer
 
+        :param pos: a list of two integers representing the x y position of the gun's center
+        :param damage: an integer representing the damage value of each rocket fired by the weapon
+        :param atk_cd: the number of ticks a weapon requires inbetween firing projectiles
+        :param ammo: the number of projectiles a weapon can fire before running out
+        :param image: the image for the sprite of the weapon
+        :param pool_size: high-water mark of the weapon's projectile pool
+        :param explosion_radius: radius of the explosion of each rocket
+        :param explosion_force: impulse an explosion applies to the enemies it hits
+        """
+
+        Weapon.__init__(self, pos, damage, atk_cd, ammo, rot_off, image, pool_size)
+
+        self.explosion_radius = explosion_radius
+        self.explosion_force = explosion_force
         self.current_target = None
         self.potential_target = None
         self.targeting_status = 0
@@ -123,18 +183,17 @@ class RocketLauncher(Weapon):
         if self.curr_atk_cd <= 0:
             self.curr_atk_cd = self.atk_cd
 
-            rocket_image = pygame.image.load("assets/rocket1.png")
-            rocket_image = pygame.transform.scale(rocket_image, [65, 65])
+            rocket_image = ASSETS.image("assets/rocket1.png", (65, 65))
 
-            return Rocket(self.damage,
-                          100,
-                          25000,
-                          self.pos + (pymunk.Vec2d(0, self.barrel_len / 2 + self.rot_off.y + rocket_image.get_height() / 2)).rotated(-self.a_pos),
-                          750,
-                          self.a_pos,
-                          rocket_image,
-                          None if self.targeting_status != OFF else self.current_target,
-                          0.05)
+            return self.pool.acquire(self.damage,
+                                     self.explosion_radius,
+                                     self.explosion_force,
+                                     self.muzzle_pos(rocket_image.get_height()),
+                                     750,
+                                     self.a_pos,
+                                     rocket_image,
+                                     None if self.targeting_status != OFF else self.current_target,
+                                     0.05)
 
 
 class LaserCannon(Weapon):
@@ -169,13 +228,10 @@ class LaserCannon(Weapon):
         :return: Projectile
         """
 
-        block_image = pygame.image.load("assets/laser_beam_block.png")
-        block_image = pygame.transform.scale(block_image, [20, 20])
-
-        contact_image = pygame.image.load('assets/laser_contact1.png')
-        contact_image = pygame.transform.scale(contact_image, [50, 50])
-
         if self.laser is None:
+            block_image = ASSETS.image("assets/laser_beam_block.png", (20, 20))
+            contact_image = ASSETS.image("assets/laser_contact1.png", (50, 50))
+
             self.laser = Laser(self.damage, self.pos + (pymunk.Vec2d(0, self.barrel_len / 2 + self.rot_off.y)).rotated(-self.a_pos),
                                self.a_pos, 200, block_image)
             self.laser_contact = LaserContact(Sprite(pymunk.Vec2d(0, 0), contact_image), pymunk.Vec2d(0, 0))